@@ -0,0 +1,448 @@
+"""End-to-end benchmark for the /generate pipeline.
+
+Builds a synthetic PDF corpus (text-only, fully scanned and mixed), serves the
+Flask app and the offline LLM stub in-process, and drives /generate at several
+concurrency levels. Per-stage timings come from the `timings` block of each
+response. Results are written as JSON so runs can be compared across releases:
+
+    python benchmark.py --pages 1,10,100,300 --concurrency 1,4,8 --output bench.json
+
+`--segmenter MB` instead times the sentence chunker alone on MB megabytes of
+synthetic text, against the previous split/join implementation.
+
+Scanned pages need Tesseract and Poppler installed, like the server itself.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+WORDS = (
+    "model data results method analysis study approach performance training "
+    "evaluation baseline accuracy network learning feature dataset experiment "
+    "significant improvement proposed framework robust error sample distribution "
+    "parameter optimization benchmark signal variance estimate hypothesis"
+).split()
+
+HEADER = "Journal of Synthetic Results - Vol. 12, No. 3"
+FOOTER = "doi:10.0000/synthetic.2024.{page}"
+
+
+def page_lines(page_no, rng, words_per_page=400):
+    lines = [HEADER, ""]
+    words = []
+    while len(words) < words_per_page:
+        sentence = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+        sentence[0] = sentence[0].capitalize()
+        words.extend(sentence)
+        words[-1] += "."
+    line = []
+    for word in words:
+        line.append(word)
+        if len(line) == 12:
+            lines.append(" ".join(line))
+            line = []
+    if line:
+        lines.append(" ".join(line))
+    lines += ["", FOOTER.format(page=page_no), str(page_no)]
+    return lines
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _text_stream(lines):
+    ops = ["BT", "/F1 10 Tf", "12 TL", "50 770 Td"]
+    for line in lines:
+        ops.append(f"({_escape(line)}) '")
+    ops.append("ET")
+    return "\n".join(ops).encode('latin-1')
+
+
+def _scanned_image(lines):
+    from PIL import Image, ImageDraw
+
+    image = Image.new('L', (1275, 1650), 255)  # US letter at 150 DPI
+    draw = ImageDraw.Draw(image)
+    y = 60
+    for line in lines:
+        draw.text((90, y), line, fill=0)
+        y += 24
+    return image
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF; `pages` is a list of ('text'|'scanned', lines)."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(None)  # filled in once the kids are known
+    page_ids = []
+    for kind, lines in pages:
+        if kind == 'text':
+            content = _text_stream(lines)
+            resources = f"<< /Font << /F1 {font_id} 0 R >> >>"
+        else:
+            image = _scanned_image(lines)
+            data = zlib.compress(image.tobytes())
+            image_id = add(
+                f"<< /Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "
+                f"/Length {len(data)} >>\nstream\n".encode('latin-1') + data + b"\nendstream"
+            )
+            content = b"q 612 0 0 792 0 0 cm /Im1 Do Q"
+            resources = f"<< /XObject << /Im1 {image_id} 0 R >> >>"
+        content_id = add(f"<< /Length {len(content)} >>\nstream\n".encode('latin-1')
+                         + content + b"\nendstream")
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 792] "
+            f"/Resources {resources} /Contents {content_id} 0 R >>".encode('latin-1')
+        ))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('latin-1')
+    catalog_id = add(f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode('latin-1'))
+
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n".encode('latin-1') + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1'))
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n".encode('latin-1'))
+
+
+def build_corpus(directory, kinds, page_counts, seed=0):
+    """Create one PDF per (kind, pages) combination and return their specs."""
+    corpus = []
+    for kind in kinds:
+        for count in page_counts:
+            rng = random.Random(f"{seed}-{kind}-{count}")
+            pages = []
+            for page_no in range(1, count + 1):
+                if kind == 'mixed':
+                    page_kind = 'scanned' if page_no % 3 == 0 else 'text'
+                else:
+                    page_kind = kind
+                pages.append((page_kind, page_lines(page_no, rng)))
+            path = os.path.join(directory, f"{kind}-{count}p.pdf")
+            write_pdf(path, pages)
+            corpus.append({'kind': kind, 'pages': count, 'path': path,
+                           'bytes': os.path.getsize(path)})
+    return corpus
+
+
+def _proc_status_mb(pid, field):
+    """A VmRSS/VmHWM line of /proc/<pid>/status in MB, or None off Linux."""
+    try:
+        with open(f"/proc/{pid}/status", encoding='ascii') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def pool_pids():
+    """Worker processes of the OCR and parse pools started so far."""
+    pids = set()
+    for name in ('ocr', 'pdf_text'):
+        executor = getattr(sys.modules.get(name), '_executor', None)
+        processes = getattr(executor, '_processes', None) or {}
+        pids.update(processes)
+    return pids
+
+
+class PoolMemorySampler:
+    """Samples the memory of the pool workers while a case runs.
+
+    The workers are started by the forkserver, so they are not children of
+    this process and getrusage() never counts them; /proc is read instead.
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.worker_peak = 0.0  # largest VmHWM of any single worker
+        self.total_peak = 0.0  # largest sum of VmRSS across workers at one sample
+        # VmHWM counts from the worker's start, so a worker kept from an earlier
+        # case reports that case's peak too
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='pool-sampler', daemon=True)
+
+    def sample(self):
+        total = 0.0
+        for pid in pool_pids():
+            hwm = _proc_status_mb(pid, 'VmHWM')
+            rss = _proc_status_mb(pid, 'VmRSS')
+            if hwm is not None:
+                self.worker_peak = max(self.worker_peak, hwm)
+            total += rss or 0.0
+        self.total_peak = max(self.total_peak, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def result(self):
+        if not sys.platform.startswith('linux'):
+            return None
+        return {'worker_max': round(self.worker_peak, 1), 'workers_total': round(self.total_peak, 1)}
+
+
+def peak_rss_mb(sampler=None):
+    """Peak resident set size of this process and, if sampled, of the pool workers."""
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1),
+        'pool': sampler.result() if sampler is not None else None
+    }
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_case(base_url, spec, concurrency, requests_per_level, form):
+    import requests
+
+    def one_request(_):
+        start = time.perf_counter()
+        with open(spec['path'], 'rb') as f:
+            response = requests.post(f"{base_url}/generate",
+                                     files={'pdfs': (os.path.basename(spec['path']), f, 'application/pdf')},
+                                     data=form, timeout=3600)
+        elapsed = time.perf_counter() - start
+        body = response.json() if response.headers.get('Content-Type', '').startswith('application/json') else {}
+        return response.status_code, elapsed, body.get('timings', {})
+
+    wall_start = time.perf_counter()
+    with PoolMemorySampler() as sampler, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one_request, range(requests_per_level)))
+    wall = time.perf_counter() - wall_start
+
+    latencies = [elapsed for status, elapsed, _ in outcomes if status == 200]
+    stages = {}
+    for status, _, timings in outcomes:
+        if status != 200:
+            continue
+        for stage, seconds in timings.items():
+            if isinstance(seconds, (int, float)):
+                stages.setdefault(stage, []).append(seconds)
+
+    return {
+        'kind': spec['kind'],
+        'pages': spec['pages'],
+        'pdf_bytes': spec['bytes'],
+        'concurrency': concurrency,
+        'requests': requests_per_level,
+        'errors': sum(1 for status, _, _ in outcomes if status != 200),
+        'wall_seconds': round(wall, 4),
+        'requests_per_second': round(len(latencies) / wall, 4) if wall else None,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p95': percentile(latencies, 0.95),
+        'stage_seconds_mean': {stage: round(sum(values) / len(values), 4)
+                               for stage, values in stages.items()},
+        'peak_rss_mb': peak_rss_mb(sampler)
+    }
+
+
+# The chunker before segmenter.py, kept as the baseline for --segmenter
+LEGACY_SENTENCE_SPLIT = re.compile(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?)\s')
+
+
+def legacy_chunk_text(text, chunk_size):
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for sentence in LEGACY_SENTENCE_SPLIT.split(text):
+        sentence_length = len(sentence.split())
+        if current_length + sentence_length > chunk_size:
+            chunks.append(' '.join(current_chunk))
+            current_chunk = []
+            current_length = 0
+        current_chunk.append(sentence)
+        current_length += sentence_length
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+    return chunks
+
+
+def segmenter_benchmark(megabytes, chunk_size=1000, repeat=3):
+    import segmenter
+
+    rng = random.Random(0)
+    lines = []
+    size = 0
+    page_no = 0
+    while size < megabytes * 1024 * 1024:
+        page_no += 1
+        page = "\n".join(page_lines(page_no, rng))
+        lines.append(page)
+        size += len(page) + 1
+    text = "\n".join(lines)
+
+    def best_of(function):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    legacy_seconds, legacy = best_of(lambda: legacy_chunk_text(text, chunk_size))
+    spans_seconds, spans = best_of(lambda: segmenter.chunk_spans(text, chunk_size))
+    sliced_seconds, _ = best_of(lambda: [span.text for span in segmenter.chunk_spans(text, chunk_size)])
+    return {
+        'megabytes': round(len(text) / 1024 / 1024, 2),
+        'chunk_size': chunk_size,
+        'legacy_seconds': round(legacy_seconds, 4),
+        'spans_seconds': round(spans_seconds, 4),
+        'spans_and_slice_seconds': round(sliced_seconds, 4),
+        'speedup': round(legacy_seconds / sliced_seconds, 2),
+        'legacy_chunks': len(legacy),
+        'chunks': len(spans),
+        'same_words': [chunk.split() for chunk in legacy if chunk] == [span.text.split() for span in spans]
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(',') if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--kinds', default='text,scanned,mixed')
+    parser.add_argument('--pages', default='1,10,100,300')
+    parser.add_argument('--concurrency', default='1,4')
+    parser.add_argument('--requests', type=int, default=0,
+                        help='requests per concurrency level (default: 2x concurrency)')
+    parser.add_argument('--llm-latency', type=float, default=0.2,
+                        help='stub LLM seconds before the first token')
+    parser.add_argument('--llm-tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--style', default='concise')
+    parser.add_argument('--duration', default='moderate')
+    parser.add_argument('--corpus-dir', help='keep the generated PDFs here')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--segmenter', type=float, metavar='MB',
+                        help='only benchmark the chunker on MB megabytes of text')
+    args = parser.parse_args()
+
+    if args.segmenter:
+        result = segmenter_benchmark(args.segmenter)
+        print(json.dumps(result, indent=2))
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='voicecraft-bench-')
+    corpus_dir = args.corpus_dir or os.path.join(work_dir, 'corpus')
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    # Measure the pipeline itself: no caches, results kept in memory
+    os.environ.setdefault('EXTRACTION_CACHE', '0')
+    os.environ.setdefault('LLM_CACHE', '0')
+    os.environ.setdefault('RESULT_STORE', 'memory')
+
+    import llm_stub
+    stub = llm_stub.create_server(port=0, latency=args.llm_latency,
+                                  tokens_per_second=args.llm_tokens_per_second)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    os.environ['OLLAMA_URL'] = f"http://127.0.0.1:{stub.server_address[1]}"
+    os.environ['LLM_BACKEND'] = 'ollama-generate'
+    os.environ.pop('LLM_BASE_URL', None)
+
+    from werkzeug.serving import make_server
+    import server
+    app_server = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=app_server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{app_server.server_port}"
+
+    print(f"Building corpus in {corpus_dir}")
+    corpus = build_corpus(corpus_dir, parse_list(args.kinds), parse_list(args.pages, int))
+    form = {'contentStyle': args.style, 'duration': args.duration}
+
+    cases = []
+    with PoolMemorySampler() as run_sampler:
+        for spec in corpus:
+            for concurrency in parse_list(args.concurrency, int):
+                requests_per_level = args.requests or concurrency * 2
+                print(f"{spec['kind']:>8} {spec['pages']:>4}p  c={concurrency}  n={requests_per_level}")
+                case = run_case(base_url, spec, concurrency, requests_per_level, form)
+                print(f"         {case['requests_per_second']} req/s  p50={case['latency_p50']}s  "
+                      f"errors={case['errors']}")
+                cases.append(case)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {
+            'llm_latency': args.llm_latency,
+            'llm_tokens_per_second': args.llm_tokens_per_second,
+            'content_style': args.style,
+            'duration': args.duration,
+            'llm_concurrency': server.LLM_CONCURRENCY,
+            'ocr_workers': server.ocr.OCR_WORKERS,
+            'ocr_dpi': server.ocr.OCR_DPI,
+            'ocr_color': server.ocr.OCR_COLOR,
+            'ocr_raster': server.ocr.OCR_RASTER,
+            'ocr_memory_mb': server.ocr.OCR_MEMORY_MB,
+            'ocr_tiered': server.ocr.OCR_TIERED
+        },
+        'cases': cases,
+        'peak_rss_mb': peak_rss_mb(run_sampler)
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    app_server.shutdown()
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
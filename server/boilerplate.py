@@ -0,0 +1,90 @@
+"""Running header, footer and page-number removal.
+
+Lines that recur near the top or bottom of many pages of one document (the
+journal name, running title, DOI line or page number) are dropped before
+chunking. Digits are ignored when comparing lines, so "Page 3" and "Page 4",
+or DOI lines ending in the page number, count as the same line.
+"""
+import os
+import re
+from collections import Counter
+
+BOILERPLATE = os.getenv('BOILERPLATE', '1') != '0'
+EDGE_LINES = 3  # non-blank lines at the top and at the bottom of a page that are checked
+REPEAT_FRACTION = 0.4  # share of the pages seen so far a line must appear on
+MIN_PAGES = 3  # a line must repeat on at least this many pages
+LEARN_PAGES = 10  # pages read ahead before the first one is released
+
+DIGITS = re.compile(r'\d+')
+# Matched against normalized lines: "12", "page 12", "12 of 30", "- 12 -"
+PAGE_NUMBER = re.compile(r'[-\s]*(page\s*)?#(\s*(of|/)\s*#)?[-\s]*')
+
+
+def normalize(line):
+    return DIGITS.sub('#', ' '.join(line.split()).lower())
+
+
+def edge_lines(lines):
+    """Indices of the first and last EDGE_LINES non-blank lines."""
+    indices = [i for i, line in enumerate(lines) if line.strip()]
+    return set(indices[:EDGE_LINES] + indices[-EDGE_LINES:])
+
+
+def strip_pages(pages, stats=None):
+    """Remove boilerplate from the (file, page_no, text) pages of one document.
+
+    The first LEARN_PAGES pages are buffered to learn which lines repeat, and
+    every later page keeps updating the counts. `stats` accumulates the
+    whitespace-delimited `tokens_total` and `tokens_removed`.
+    """
+    stats = stats if stats is not None else {}
+    counts = Counter()
+    seen = 0
+
+    def learn(text):
+        nonlocal seen
+        lines = text.splitlines()
+        counts.update({normalize(lines[i]) for i in edge_lines(lines)})
+        seen += 1
+
+    def strip(page):
+        path, page_no, text = page
+        lines = text.splitlines(keepends=True)
+        min_count = max(MIN_PAGES, REPEAT_FRACTION * seen)
+        edges = edge_lines(lines)
+        kept = []
+        removed = 0
+        for i, line in enumerate(lines):
+            if i in edges:
+                key = normalize(line)
+                if PAGE_NUMBER.fullmatch(key) or counts[key] >= min_count:
+                    removed += len(line.split())
+                    continue
+            kept.append(line)
+        stats['tokens_total'] = stats.get('tokens_total', 0) + len(text.split())
+        stats['tokens_removed'] = stats.get('tokens_removed', 0) + removed
+        return path, page_no, ''.join(kept)
+
+    buffered = []
+    for page in pages:
+        learn(page[2])
+        if buffered is None:
+            yield strip(page)
+            continue
+        buffered.append(page)
+        if len(buffered) >= LEARN_PAGES:
+            for buffered_page in buffered:
+                yield strip(buffered_page)
+            buffered = None
+    for buffered_page in buffered or ():
+        yield strip(buffered_page)
+
+
+def report(stats):
+    total = stats.get('tokens_total', 0)
+    removed = stats.get('tokens_removed', 0)
+    return {
+        'tokens_total': total,
+        'tokens_removed': removed,
+        'percent_removed': round(100.0 * removed / total, 2) if total else 0.0
+    }
@@ -0,0 +1,60 @@
+"""Near-duplicate chunk detection by sampled shingle containment.
+
+A chunk is reduced to the hashes of its 5-word shingles, keeping the hashes
+that fall in a fixed 1/SAMPLE_RATE sample. As with MinHash, the same shingles
+are sampled in every chunk. A chunk whose sampled shingles were almost all
+seen in earlier chunks is a near-duplicate. This holds even when the chunk
+boundaries of two copies of a text do not line up, where pairwise similarity
+between chunks would stay low.
+"""
+import os
+import re
+import zlib
+from collections import Counter
+
+DEDUP = os.getenv('DEDUP', '1') != '0'
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.8'))
+SHINGLE_WORDS = 5
+SAMPLE_RATE = 4
+MIN_SAMPLES = 8  # shorter chunks are always kept
+
+WORD = re.compile(r'\w+')
+
+
+def fingerprint(text):
+    """Sampled shingle hashes of a text."""
+    words = WORD.findall(text.lower())
+    shingles = (' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1))
+    # crc32 rather than hash() so fingerprints do not depend on PYTHONHASHSEED
+    hashes = {zlib.crc32(shingle.encode('utf-8')) for shingle in shingles}
+    return {value for value in hashes if value % SAMPLE_RATE == 0}
+
+
+def iter_unique(chunks, skipped, threshold=None):
+    """Yield the chunks whose text was not already covered by earlier chunks.
+
+    Every dropped chunk is appended to `skipped` as a dict with its `chunk`
+    index, the earlier chunk it overlaps most (`duplicate_of`), the fraction
+    of its text already seen (`similarity`) and its `words`. Indices count
+    all chunks, in input order.
+    """
+    threshold = DEDUP_THRESHOLD if threshold is None else threshold
+    first_seen = {}  # sampled hash -> first chunk that contained it
+    for index, chunk in enumerate(chunks):
+        text = str(chunk)
+        current = fingerprint(text)
+        owners = [first_seen[value] for value in current if value in first_seen]
+        if len(current) >= MIN_SAMPLES and len(owners) >= threshold * len(current):
+            duplicate_of = Counter(owners).most_common(1)[0][0]
+            similarity = len(owners) / len(current)
+            skipped.append({
+                'chunk': index,
+                'duplicate_of': duplicate_of,
+                'similarity': round(similarity, 3),
+                'words': len(text.split())
+            })
+            print(f"Skipping chunk {index+1}: {similarity:.0%} already covered (mostly by chunk {duplicate_of+1})")
+            continue
+        for value in current:
+            first_seen.setdefault(value, index)
+        yield chunk
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import ocr
+
+# Bump whenever the extraction/OCR output format changes so stale pages are
+# never served for a newer extractor.
+EXTRACTOR_VERSION = '1'
+
+CACHE_DIR = os.getenv(
+    'EXTRACTION_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'extraction')
+)
+CACHE_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '512')) * 1024 * 1024
+CACHE_ENABLED = os.getenv('EXTRACTION_CACHE', '1') != '0'
+# Other processes write to the same directory, so the local byte count is
+# replaced by a scan of the disk at least this often
+CACHE_RESCAN_SECONDS = float(os.getenv('EXTRACTION_CACHE_RESCAN_SECONDS', '30'))
+
+MANIFEST_NAME = 'manifest.json'
+
+_lock = threading.Lock()
+_total_bytes = None  # lazily computed from disk on first write
+_scanned_at = 0.0
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def file_digest(path):
+    """SHA-256 of the file contents, read in 1MB blocks."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _document_dir(digest):
+    # OCR'd pages are cached with the text pages, so OCR settings are part of the key
+    return os.path.join(CACHE_DIR, f"{digest}-v{EXTRACTOR_VERSION}-{ocr.config_fingerprint()}")
+
+
+def _page_path(digest, page_index):
+    return os.path.join(_document_dir(digest), f"page-{page_index:05d}.txt")
+
+
+def _count(key, amount=1):
+    with _lock:
+        _stats[key] += amount
+
+
+def _touch(path):
+    # mtime doubles as the LRU access time
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def _cache_files():
+    for root, _, names in os.walk(CACHE_DIR):
+        for name in names:
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            yield path, st.st_size, st.st_mtime
+
+
+def _evict_if_needed(added_bytes):
+    """Drop least recently used files until the cache fits CACHE_MAX_BYTES."""
+    global _total_bytes, _scanned_at
+    with _lock:
+        now = time.monotonic()
+        if _total_bytes is None or now - _scanned_at >= CACHE_RESCAN_SECONDS:
+            _total_bytes = sum(size for _, size, _ in _cache_files())
+            _scanned_at = now
+        else:
+            _total_bytes += added_bytes
+        if _total_bytes <= CACHE_MAX_BYTES:
+            return
+
+        entries = sorted(_cache_files(), key=lambda entry: entry[2])
+        _total_bytes = sum(size for _, size, _ in entries)
+        _scanned_at = now
+        for path, size, _ in entries:
+            if _total_bytes <= CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            _total_bytes -= size
+            _stats['evictions'] += 1
+            directory = os.path.dirname(path)
+            # A document missing any page is no longer complete
+            if not path.endswith(MANIFEST_NAME):
+                manifest = os.path.join(directory, MANIFEST_NAME)
+                if os.path.exists(manifest):
+                    _total_bytes -= os.path.getsize(manifest)
+                    os.remove(manifest)
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+
+def get_document(digest):
+    """Return the cached page texts of a fully extracted PDF, or None."""
+    if not CACHE_ENABLED:
+        return None
+    manifest = os.path.join(_document_dir(digest), MANIFEST_NAME)
+    try:
+        with open(manifest, encoding='utf-8') as f:
+            page_count = json.load(f)['pages']
+        pages = []
+        for index in range(page_count):
+            path = _page_path(digest, index)
+            with open(path, encoding='utf-8') as f:
+                pages.append(f.read())
+            _touch(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    _touch(manifest)
+    _count('hits', len(pages))
+    return pages
+
+
+def has_document(digest):
+    """Whether a fully extracted PDF is cached, without reading its pages."""
+    return CACHE_ENABLED and os.path.exists(os.path.join(_document_dir(digest), MANIFEST_NAME))
+
+
+def get_page(digest, page_index):
+    if not CACHE_ENABLED:
+        return None
+    path = _page_path(digest, page_index)
+    try:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except OSError:
+        _count('misses')
+        return None
+    _touch(path)
+    _count('hits')
+    return text
+
+
+def put_page(digest, page_index, text):
+    if not CACHE_ENABLED:
+        return
+    try:
+        size = _write_atomic(_page_path(digest, page_index), text)
+        _evict_if_needed(size)
+    except OSError as e:
+        print(f"Extraction cache write failed: {str(e)}")
+
+
+def put_document(digest, page_count):
+    """Mark a document as complete once every page has been stored."""
+    if not CACHE_ENABLED:
+        return
+    manifest = os.path.join(_document_dir(digest), MANIFEST_NAME)
+    try:
+        size = _write_atomic(manifest, json.dumps({'pages': page_count}))
+        _evict_if_needed(size)
+    except OSError as e:
+        print(f"Extraction cache write failed: {str(e)}")
+
+
+def add_counts(counts):
+    """Fold in lookups made by another process, e.g. a parse pool worker."""
+    with _lock:
+        for key, amount in counts.items():
+            _stats[key] += amount
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+        result['bytes'] = _total_bytes
+    lookups = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / lookups if lookups else 0.0
+    return result
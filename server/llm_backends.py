@@ -0,0 +1,224 @@
+import json
+import os
+
+import requests
+
+import llm_client
+
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'ollama-generate')
+LLM_BASE_URL = os.getenv('LLM_BASE_URL', '')
+LLM_API_KEY = os.getenv('LLM_API_KEY', '')
+
+
+class BackendError(Exception):
+    pass
+
+
+# Transport failures once llm_client's retries are spent, and malformed bodies
+_WRAPPED_ERRORS = (requests.RequestException, KeyError, IndexError, TypeError, ValueError)
+
+
+class LLMBackend:
+    """Common interface: generate() for a single prompt, chat() for messages.
+
+    Subclasses implement the protocol-specific _generate/_chat and their
+    streaming variants; each yields text deltas as they arrive.
+    """
+
+    name = None
+    default_base_url = None
+
+    def __init__(self, base_url=None, api_key=None):
+        self.base_url = (base_url or self.default_base_url or '').rstrip('/')
+        self.api_key = api_key
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def headers(self):
+        if not self.api_key:
+            return None
+        return {'Authorization': f"Bearer {self.api_key}"}
+
+    def _post(self, path, payload, stream=False, **kwargs):
+        response = llm_client.post(self.url(path), json=payload, headers=self.headers(),
+                                   stream=stream, **kwargs)
+        if response.status_code != 200:
+            body = response.text if not stream else ''
+            response.close()
+            raise BackendError(f"{self.name} returned {response.status_code}: {body}")
+        return response
+
+    def _wrap(self, error):
+        return BackendError(f"{self.name} request failed: {type(error).__name__}: {error}")
+
+    def _guard_stream(self, deltas):
+        try:
+            yield from deltas
+        except _WRAPPED_ERRORS as e:
+            raise self._wrap(e) from e
+
+    # Public calls raise only BackendError, so callers can skip a failed
+    # chunk instead of failing the whole request
+
+    def generate(self, model, prompt, options=None, **kwargs):
+        try:
+            return self._generate(model, prompt, options, **kwargs)
+        except _WRAPPED_ERRORS as e:
+            raise self._wrap(e) from e
+
+    def generate_stream(self, model, prompt, options=None, **kwargs):
+        return self._guard_stream(self._generate_stream(model, prompt, options, **kwargs))
+
+    def chat(self, model, messages, options=None, **kwargs):
+        try:
+            return self._chat(model, messages, options, **kwargs)
+        except _WRAPPED_ERRORS as e:
+            raise self._wrap(e) from e
+
+    def chat_stream(self, model, messages, options=None, **kwargs):
+        return self._guard_stream(self._chat_stream(model, messages, options, **kwargs))
+
+    def _generate(self, model, prompt, options=None, **kwargs):
+        return self._chat(model, [{'role': 'user', 'content': prompt}], options, **kwargs)
+
+    def _generate_stream(self, model, prompt, options=None, **kwargs):
+        return self._chat_stream(model, [{'role': 'user', 'content': prompt}], options, **kwargs)
+
+    def _chat(self, model, messages, options=None, **kwargs):
+        raise NotImplementedError
+
+    def _chat_stream(self, model, messages, options=None, **kwargs):
+        raise NotImplementedError
+
+
+def _iter_ndjson(response):
+    with response:
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+class OllamaGenerateBackend(LLMBackend):
+    """Ollama /api/generate (prompt in, text out)."""
+
+    name = 'ollama-generate'
+    default_base_url = llm_client.OLLAMA_URL
+
+    def _generate(self, model, prompt, options=None, **kwargs):
+        response = self._post('/api/generate', {
+            'model': model,
+            'prompt': prompt,
+            'stream': False,
+            'options': options or {}
+        }, **kwargs)
+        return response.json()['response']
+
+    def _generate_stream(self, model, prompt, options=None, **kwargs):
+        response = self._post('/api/generate', {
+            'model': model,
+            'prompt': prompt,
+            'stream': True,
+            'options': options or {}
+        }, stream=True, **kwargs)
+        for data in _iter_ndjson(response):
+            yield data.get('response', '')
+            if data.get('done'):
+                break
+
+    def _chat(self, model, messages, options=None, **kwargs):
+        return self._generate(model, _flatten(messages), options, **kwargs)
+
+    def _chat_stream(self, model, messages, options=None, **kwargs):
+        return self._generate_stream(model, _flatten(messages), options, **kwargs)
+
+
+def _flatten(messages):
+    return "\n\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+
+
+class OllamaChatBackend(LLMBackend):
+    """Ollama /api/chat (messages in, assistant message out)."""
+
+    name = 'ollama-chat'
+    default_base_url = llm_client.OLLAMA_URL
+
+    def _chat(self, model, messages, options=None, **kwargs):
+        response = self._post('/api/chat', {
+            'model': model,
+            'messages': messages,
+            'stream': False,
+            'options': options or {}
+        }, **kwargs)
+        data = response.json()
+        if 'message' not in data or 'content' not in data['message']:
+            raise BackendError("ollama-chat response is missing message content")
+        return data['message']['content']
+
+    def _chat_stream(self, model, messages, options=None, **kwargs):
+        response = self._post('/api/chat', {
+            'model': model,
+            'messages': messages,
+            'stream': True,
+            'options': options or {}
+        }, stream=True, **kwargs)
+        for data in _iter_ndjson(response):
+            yield data.get('message', {}).get('content', '')
+            if data.get('done'):
+                break
+
+
+class OpenAIChatBackend(LLMBackend):
+    """OpenAI-compatible /chat/completions (Groq, vLLM, llama.cpp server...)."""
+
+    name = 'openai'
+    default_base_url = 'https://api.groq.com/openai/v1'
+
+    # Ollama option names -> OpenAI request fields
+    OPTION_FIELDS = {
+        'temperature': 'temperature',
+        'top_p': 'top_p',
+        'max_tokens': 'max_tokens',
+        'num_predict': 'max_tokens',
+        'seed': 'seed',
+        'stop': 'stop'
+    }
+
+    def _payload(self, model, messages, options, stream):
+        payload = {'model': model, 'messages': messages, 'stream': stream}
+        for key, value in (options or {}).items():
+            if key in self.OPTION_FIELDS:
+                payload[self.OPTION_FIELDS[key]] = value
+        return payload
+
+    def _chat(self, model, messages, options=None, **kwargs):
+        response = self._post('/chat/completions',
+                              self._payload(model, messages, options, False), **kwargs)
+        return response.json()['choices'][0]['message']['content']
+
+    def _chat_stream(self, model, messages, options=None, **kwargs):
+        response = self._post('/chat/completions',
+                              self._payload(model, messages, options, True),
+                              stream=True, **kwargs)
+        with response:
+            for line in response.iter_lines():
+                if not line or not line.startswith(b'data:'):
+                    continue
+                data = line[len(b'data:'):].strip()
+                if data == b'[DONE]':
+                    break
+                delta = json.loads(data)['choices'][0].get('delta', {})
+                yield delta.get('content') or ''
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (OllamaGenerateBackend, OllamaChatBackend, OpenAIChatBackend)
+}
+
+
+def create_backend(name=None, base_url=None, api_key=None):
+    name = name or LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND: {name} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](base_url or LLM_BASE_URL or None, api_key or LLM_API_KEY or None)
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE', '1') != '0'
+LLM_CACHE_PATH = os.getenv(
+    'LLM_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'llm.sqlite3')
+)
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def cache_key(model, prompt, options):
+    payload = json.dumps([model, prompt, options], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _connection():
+    global _initialized
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        os.makedirs(os.path.dirname(LLM_CACHE_PATH) or '.', exist_ok=True)
+        conn = sqlite3.connect(LLM_CACHE_PATH, timeout=10)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _local.conn = conn
+    with _init_lock:
+        if not _initialized:
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS responses ('
+                    ' key TEXT PRIMARY KEY,'
+                    ' response TEXT NOT NULL,'
+                    ' size INTEGER NOT NULL,'
+                    ' last_used REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+            _initialized = True
+    return conn
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def get(key):
+    """Return the cached response text for a key, or None."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    try:
+        with _connection() as conn:
+            row = conn.execute('SELECT response FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+    except sqlite3.Error as e:
+        print(f"LLM cache read failed: {str(e)}")
+        return None
+    _count('hits' if row is not None else 'misses')
+    return row[0] if row is not None else None
+
+
+def put(key, response):
+    if not LLM_CACHE_ENABLED:
+        return
+    size = len(response.encode('utf-8'))
+    try:
+        with _connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)',
+                (key, response, size, time.time())
+            )
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > LLM_CACHE_MAX_BYTES:
+                # Evict least recently used responses until back under the cap
+                evicted = 0
+                for old_key, old_size in conn.execute(
+                        'SELECT key, size FROM responses ORDER BY last_used ASC').fetchall():
+                    if total <= LLM_CACHE_MAX_BYTES:
+                        break
+                    conn.execute('DELETE FROM responses WHERE key = ?', (old_key,))
+                    total -= old_size
+                    evicted += 1
+                _count('evictions', evicted)
+    except sqlite3.Error as e:
+        print(f"LLM cache write failed: {str(e)}")
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+    lookups = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / lookups if lookups else 0.0
+    return result
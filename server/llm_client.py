@@ -0,0 +1,186 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '300'))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '2'))
+LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '16'))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', '1'))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', '30'))
+LLM_RETRY_AFTER_MAX = float(os.getenv('LLM_RETRY_AFTER_MAX', '300'))
+# Requests per second per host, shared by every thread; 0 disables the limit
+LLM_RATE_LIMIT = float(os.getenv('LLM_RATE_LIMIT', '0'))
+LLM_RATE_BURST = int(os.getenv('LLM_RATE_BURST', '0')) or max(1, int(LLM_RATE_LIMIT))
+
+RETRY_STATUSES = (429, 502, 503, 504)
+# Quota and overload answers: back off every thread, not just the caller
+SHARED_BACKOFF_STATUSES = (429, 503)
+
+_session = None
+_session_lock = threading.Lock()
+_latencies = deque(maxlen=1000)
+_stats_lock = threading.Lock()
+_stats = {'requests': 0, 'retries': 0, 'errors': 0, 'throttled_seconds': 0.0}
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket with a backoff shared by every thread.
+
+    Once any thread is told to back off, every thread waits until the pause
+    is over. The bucket starts empty after a pause so requests resume at
+    `rate` instead of all at once.
+    """
+
+    def __init__(self, rate=0.0, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                if delay <= 0:
+                    if self.rate <= 0:
+                        return waited
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._paused_until
+
+
+def get_limiter(url):
+    """The process-wide limiter for the host of `url`."""
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = RateLimiter(LLM_RATE_LIMIT, LLM_RATE_BURST)
+        return _limiters[host]
+
+
+def get_session():
+    """One keep-alive Session per process, shared by every thread."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=LLM_POOL_SIZE,
+                                  pool_maxsize=LLM_POOL_SIZE,
+                                  max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Exponential backoff with full jitter, or the server's Retry-After."""
+    if retry_after is not None:
+        try:
+            return min(max(0.0, float(retry_after)), LLM_RETRY_AFTER_MAX)
+        except ValueError:
+            pass
+        try:
+            # Retry-After may also be an HTTP date
+            seconds = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            return min(max(0.0, seconds), LLM_RETRY_AFTER_MAX)
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _record(url, seconds, status):
+    with _stats_lock:
+        _stats['requests'] += 1
+        if status is None or status >= 500:
+            _stats['errors'] += 1
+        _latencies.append((url, seconds, status))
+
+
+def post(url, json=None, headers=None, stream=False, timeout=None, retries=None):
+    """POST through the pooled session with timeouts and jittered retries.
+
+    Connection errors, timeouts and RETRY_STATUSES are retried; any other
+    response is returned as-is. Every attempt goes through the host's
+    RateLimiter. `response.latency` holds the seconds spent on the final
+    attempt (time to headers when streaming).
+    """
+    if timeout is None:
+        timeout = (LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+    if retries is None:
+        retries = LLM_MAX_RETRIES
+    session = get_session()
+    limiter = get_limiter(url)
+
+    for attempt in range(retries + 1):
+        waited = limiter.acquire()
+        if waited:
+            with _stats_lock:
+                _stats['throttled_seconds'] += waited
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json=json, headers=headers,
+                                    stream=stream, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            _record(url, time.perf_counter() - start, None)
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"LLM request failed ({str(e)}), retrying in {delay:.1f}s")
+        else:
+            response.latency = time.perf_counter() - start
+            _record(url, response.latency, response.status_code)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            delay = backoff_delay(attempt, response.headers.get('Retry-After'))
+            print(f"LLM returned {response.status_code}, retrying in {delay:.1f}s")
+            response.close()
+            if response.status_code in SHARED_BACKOFF_STATUSES:
+                # The next acquire() waits out the pause, along with every other thread
+                limiter.pause(delay)
+                delay = 0
+        with _stats_lock:
+            _stats['retries'] += 1
+        time.sleep(delay)
+
+
+def ollama_url(path):
+    return f"{OLLAMA_URL.rstrip('/')}/{path.lstrip('/')}"
+
+
+def stats():
+    with _stats_lock:
+        result = dict(_stats)
+        samples = sorted(seconds for _, seconds, _ in _latencies)
+    if samples:
+        result['latency_p50'] = samples[len(samples) // 2]
+        result['latency_p95'] = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        result['latency_mean'] = sum(samples) / len(samples)
+    return result
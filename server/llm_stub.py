@@ -0,0 +1,177 @@
+"""Offline stand-in for Ollama and OpenAI-compatible LLM servers.
+
+Replays canned responses with a configurable first-token latency and
+generation speed, so the pipeline can be load-tested without a GPU or
+network access:
+
+    python llm_stub.py --port 11434 --latency 0.5 --tokens-per-second 40
+    LLM_BACKEND=ollama-generate OLLAMA_URL=http://localhost:11434 python server.py
+
+Serves /api/generate, /api/chat and /v1/chat/completions, streaming and not.
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSES = [
+    'Title: "Inside the Research" Welcome to the show! Today we are unpacking a '
+    'fascinating paper. What problem were the authors trying to solve, and why '
+    'does it matter? Think of it like tuning an engine: every small change adds '
+    'up. The study reports a clear improvement over previous approaches, and the '
+    'methodology is refreshingly transparent.',
+    'Now, building on this, the authors compare several baselines across a range '
+    'of datasets. Another crucial aspect is how the results hold up under noise. '
+    'Surprisingly, the simplest variant performs almost as well as the full '
+    'model. Could that change how practitioners approach the problem?',
+    'To wrap up, the key takeaway is that careful evaluation matters as much as '
+    'clever modelling. Thanks for listening, and if this sparked your curiosity, '
+    'go read the paper and share it with a friend.'
+]
+
+
+class StubConfig:
+    def __init__(self, responses, latency, tokens_per_second):
+        self.responses = responses
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self._cycle = itertools.cycle(responses)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def next_response(self):
+        with self._lock:
+            self.requests += 1
+            return next(self._cycle)
+
+
+def tokenize(text):
+    """Split into word-ish tokens that concatenate back to the original text."""
+    tokens = []
+    for word in text.split(' '):
+        tokens.append(word if not tokens else ' ' + word)
+    return tokens
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    config = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _tokens(self):
+        """Yield canned tokens paced by the configured latency and speed."""
+        time.sleep(self.config.latency)
+        delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second > 0 else 0
+        for token in tokenize(self.config.next_response()):
+            if delay:
+                time.sleep(delay)
+            yield token
+
+    def do_GET(self):
+        if self.path in ('/', '/api/tags', '/health'):
+            self._send_json({'status': 'ok', 'requests': self.config.requests, 'models': []})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        payload = self._read_json()
+        stream = payload.get('stream', self.path != '/v1/chat/completions')
+        model = payload.get('model', 'stub')
+
+        if self.path == '/api/generate':
+            self._ollama(stream, model, lambda text: {'response': text})
+        elif self.path == '/api/chat':
+            self._ollama(stream, model,
+                         lambda text: {'message': {'role': 'assistant', 'content': text}})
+        elif self.path in ('/v1/chat/completions', '/chat/completions'):
+            self._openai(stream, model)
+        else:
+            self.send_error(404)
+
+    def _ollama(self, stream, model, body):
+        if not stream:
+            response = body(''.join(self._tokens()))
+            self._send_json(dict(response, model=model, done=True))
+            return
+        self._start_stream('application/x-ndjson')
+        for token in self._tokens():
+            self._write_chunk(json.dumps(dict(body(token), model=model, done=False)).encode() + b"\n")
+        self._write_chunk(json.dumps(dict(body(''), model=model, done=True)).encode() + b"\n")
+        self._write_chunk(b'')
+
+    def _openai(self, stream, model):
+        if not stream:
+            text = ''.join(self._tokens())
+            self._send_json({
+                'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': text}}]
+            })
+            return
+        self._start_stream('text/event-stream')
+        for token in self._tokens():
+            event = {'model': model, 'choices': [{'index': 0, 'delta': {'content': token}}]}
+            self._write_chunk(f"data: {json.dumps(event)}\n\n".encode())
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b'')
+
+
+def create_server(host='127.0.0.1', port=11434, responses=None, latency=0.0, tokens_per_second=0.0):
+    """Build (but do not start) a stub server; port 0 picks a free port."""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'config': StubConfig(responses or DEFAULT_RESPONSES, latency, tokens_per_second)
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=0.0,
+                        help='generation speed; 0 returns everything at once')
+    parser.add_argument('--responses', help='JSON file with a list of canned responses')
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses, encoding='utf-8') as f:
+            responses = json.load(f)
+
+    server = create_server(args.host, args.port, responses, args.latency, args.tokens_per_second)
+    print(f"LLM stub listening on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Minimal Prometheus histograms rendered in the text exposition format.
+
+Metrics are per process; under gunicorn each worker exposes its own series,
+which Prometheus aggregates when scraping every worker.
+"""
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+REQUEST_LABELS = ('model', 'style', 'duration')
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['counts']):
+                    labels = _format_labels(self.label_names, key, [('le', _format_number(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+PAGE_EXTRACTION_SECONDS = Histogram(
+    'voicecraft_page_extraction_seconds', 'Time to extract the text of one PDF page.',
+    REQUEST_LABELS + ('method',))
+OCR_PAGES_PER_DOCUMENT = Histogram(
+    'voicecraft_ocr_pages_per_document', 'Pages per document that needed OCR.',
+    REQUEST_LABELS, COUNT_BUCKETS)
+OCR_PAGE_CONFIDENCE = Histogram(
+    'voicecraft_ocr_page_confidence', 'Mean Tesseract word confidence of one OCR page, per tiered pass.',
+    REQUEST_LABELS + ('ocr_pass',), (20, 40, 50, 60, 70, 75, 80, 85, 90, 95, 100))
+CHUNKS_PER_REQUEST = Histogram(
+    'voicecraft_chunks_per_request', 'Chunks sent to the LLM per request.',
+    REQUEST_LABELS, COUNT_BUCKETS)
+DUPLICATE_CHUNKS_PER_REQUEST = Histogram(
+    'voicecraft_duplicate_chunks_per_request', 'Near-duplicate chunks skipped per request.',
+    REQUEST_LABELS, COUNT_BUCKETS)
+BOILERPLATE_PERCENT_REMOVED = Histogram(
+    'voicecraft_boilerplate_percent_removed',
+    'Percent of extracted tokens removed as headers, footers and page numbers.',
+    REQUEST_LABELS, (0, 1, 2, 5, 10, 15, 20, 30, 50))
+LLM_REQUEST_SECONDS = Histogram(
+    'voicecraft_llm_request_seconds', 'Latency of one LLM generation request.',
+    REQUEST_LABELS)
+QUEUE_WAIT_SECONDS = Histogram(
+    'voicecraft_queue_wait_seconds', 'Time spent waiting on a job or pipeline queue.',
+    REQUEST_LABELS + ('queue',))
+STAGE_SECONDS = Histogram(
+    'voicecraft_stage_seconds', 'Busy time per pipeline stage for one request.',
+    REQUEST_LABELS + ('stage',))
+
+
+def render_counters(name, documentation, values, metric_type='counter'):
+    """Render a flat dict of numbers as one labelled metric family."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    for key, value in sorted(values.items()):
+        if isinstance(value, (int, float)):
+            lines.append(f'{name}{{kind="{_escape(key)}"}} {_format_number(value)}')
+    return lines
+
+
+def render(extra_lines=()):
+    lines = []
+    for histogram in _registry:
+        lines.extend(histogram.render())
+    lines.extend(extra_lines)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,358 @@
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# pytesseract and pdf2image are imported on first use so text-only PDFs, and
+# server start-up, never pay for them
+
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '0')) or os.cpu_count() or 1
+OCR_DPI = int(os.getenv('OCR_DPI', '200'))
+OCR_COLOR = os.getenv('OCR_COLOR', 'gray')  # rgb, gray or mono (1-bit)
+# paths: pages go to temp files; memory: shared memory buffers
+OCR_RASTER = os.getenv('OCR_RASTER', 'paths')
+# Rasterized pages held at once by this process, across all requests
+OCR_MEMORY_MB = int(os.getenv('OCR_MEMORY_MB', '256'))
+# Pages a document reader may run ahead of the first page still being OCR'd
+OCR_LOOKAHEAD_PAGES = int(os.getenv('OCR_LOOKAHEAD_PAGES', '0')) or 4 * OCR_WORKERS
+# Tiered mode: a fast pass at OCR_FAST_DPI, then pages whose mean word
+# confidence is below OCR_MIN_CONFIDENCE are redone at OCR_ESCALATION_DPI
+OCR_TIERED = os.getenv('OCR_TIERED', '0') == '1'
+OCR_FAST_DPI = int(os.getenv('OCR_FAST_DPI', '150'))
+OCR_ESCALATION_DPI = int(os.getenv('OCR_ESCALATION_DPI', '300'))
+OCR_MIN_CONFIDENCE = float(os.getenv('OCR_MIN_CONFIDENCE', '75'))
+
+# As rendered by poppler: mono pages are rendered in grayscale and only
+# reduced to 1 bit afterwards, so they are budgeted at a byte per pixel
+_BYTES_PER_PIXEL = {'rgb': 3, 'gray': 1, 'mono': 1}
+
+_executor = None
+_dispatcher = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'pages': 0, 'escalated': 0}
+
+
+def pool_context():
+    """Start method for the OCR and parse pools.
+
+    Pools are created lazily inside requests, while other threads may hold
+    locks such as extraction_cache's; a plain fork would copy them held.
+    Workers are forked from a clean forkserver process instead, which only
+    preloads the worker modules (not the server's __main__), and which also
+    shares the parent's resource tracker for OCR_RASTER=memory.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['extraction_cache', 'ocr'])
+    return context
+
+
+def get_executor():
+    """Process pool shared by every request; created on first OCR job."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=pool_context())
+        return _executor
+
+
+def config_fingerprint():
+    """Short key of the settings that change OCR output, for cache keys."""
+    if OCR_TIERED:
+        settings = ('tiered', OCR_COLOR, OCR_FAST_DPI, OCR_ESCALATION_DPI, OCR_MIN_CONFIDENCE)
+    else:
+        settings = ('single', OCR_COLOR, OCR_DPI)
+    return hashlib.sha256(repr(settings).encode()).hexdigest()[:8]
+
+
+def dispatch(fn, *args):
+    """Run fn(*args) on a background thread, so a caller can keep parsing
+    while earlier scanned pages are OCR'd; returns its Future."""
+    global _dispatcher
+    with _executor_lock:
+        if _dispatcher is None:
+            _dispatcher = ThreadPoolExecutor(max_workers=4 * OCR_WORKERS, thread_name_prefix='ocr-dispatch')
+        return _dispatcher.submit(fn, *args)
+
+
+def page_runs(page_indices):
+    """Group sorted 0-based page indices into contiguous (first, last) runs."""
+    runs = []
+    for index in sorted(set(page_indices)):
+        if runs and runs[-1][1] == index - 1:
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    return [tuple(run) for run in runs]
+
+
+def page_bytes(dpi=None):
+    """Estimated size of one rasterized page: US Letter at `dpi` (OCR_DPI)."""
+    dpi = dpi or OCR_DPI
+    pixels = int(8.5 * dpi) * int(11 * dpi)
+    return max(1, int(pixels * _BYTES_PER_PIXEL.get(OCR_COLOR, 3)))
+
+
+class MemoryBudget:
+    """Bytes of rasterized pages in flight, shared by every request.
+
+    A reservation larger than the whole budget is still granted once
+    nothing else is in flight, so a huge page cannot block forever.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, amount):
+        with self._cond:
+            while self.in_use and self.in_use + amount > self.limit:
+                self._cond.wait()
+            self.in_use += amount
+
+    def release(self, amount):
+        with self._cond:
+            self.in_use -= amount
+            self._cond.notify_all()
+
+
+budget = MemoryBudget(OCR_MEMORY_MB * 1024 * 1024)
+
+
+def batches(page_indices, size):
+    """Split contiguous runs into (first, last) batches of at most `size` pages."""
+    result = []
+    for first, last in page_runs(page_indices):
+        for start in range(first, last + 1, size):
+            result.append((start, min(start + size - 1, last)))
+    return result
+
+
+def rasterize(pdf_path, first, last, dpi, output_folder=None):
+    """Render pages first..last (0-based) with one poppler call.
+
+    Returns PIL images, or file paths when `output_folder` is given.
+    """
+    from pdf2image import convert_from_path
+
+    options = {'dpi': dpi, 'grayscale': OCR_COLOR != 'rgb',
+               'first_page': first + 1, 'last_page': last + 1}
+    if output_folder is not None:
+        options.update(output_folder=output_folder, paths_only=True)
+    return convert_from_path(pdf_path, **options)
+
+
+def _prepare(image):
+    if OCR_COLOR == 'mono' and image.mode != '1':
+        return image.convert('1')
+    return image
+
+
+def _share(image):
+    """Copy an image into a new shared memory block; the caller unlinks it."""
+    from multiprocessing import shared_memory
+
+    image = _prepare(image)
+    data = image.tobytes()
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    block.buf[:len(data)] = data
+    return block, (block.name, image.mode, image.size)
+
+
+def _preload():
+    import pytesseract  # noqa: F401
+    return os.getpid()
+
+
+def _read_words(image):
+    """Text and mean word confidence (0-100) from one image_to_data call.
+
+    Words are joined per line, with a blank line between paragraphs. The
+    confidence is None when no word was found.
+    """
+    import pytesseract
+
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    lines = []
+    confidences = []
+    previous = None
+    for i, word in enumerate(data['text']):
+        confidence = float(data['conf'][i])
+        if confidence < 0 or not word.strip():
+            continue
+        confidences.append(confidence)
+        paragraph = (data['block_num'][i], data['par_num'][i])
+        line = paragraph + (data['line_num'][i],)
+        if line != previous:
+            if previous is not None and paragraph != previous[:2]:
+                lines.append("")
+            lines.append(word)
+            previous = line
+        else:
+            lines[-1] += " " + word
+    mean = sum(confidences) / len(confidences) if confidences else None
+    return "\n".join(lines), mean
+
+
+def _recognize(image, with_confidence=False):
+    """Return (text, confidence); confidence is only measured when asked."""
+    if with_confidence:
+        return _read_words(image)
+    import pytesseract
+
+    return pytesseract.image_to_string(image), None
+
+
+def _recognize_path(path, with_confidence=False):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return _recognize(_prepare(image), with_confidence)
+
+
+def _recognize_shared(shared, with_confidence=False):
+    from multiprocessing import shared_memory
+    from PIL import Image
+
+    name, mode, size = shared
+    # The parent unlinks the block once this call is done
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        image = Image.frombuffer(mode, size, block.buf, 'raw', mode, 0, 1)
+        result = _recognize(image, with_confidence)
+        # The image must drop its view of the buffer before the block closes
+        del image
+        return result
+    finally:
+        block.close()
+
+
+def warm_up():
+    """Import the OCR stack and start every pool worker ahead of the first scan."""
+    import pdf2image  # noqa: F401
+
+    executor = get_executor()
+    futures = [executor.submit(_preload) for _ in range(OCR_WORKERS)]
+    for future in futures:
+        future.result()
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _release_when_done(future, size, cleanup):
+    def done(_):
+        try:
+            cleanup()
+        finally:
+            budget.release(size)
+    future.add_done_callback(done)
+
+
+def _submit_batch(executor, pdf_path, first, last, dpi, with_confidence, spool_dir):
+    """Rasterize one batch and queue its pages; each page's share of the
+    budget is released, and its buffer or file removed, once it is OCR'd."""
+    size = page_bytes(dpi)
+    futures = {}
+    submitted = 0
+    try:
+        if OCR_RASTER == 'memory':
+            images = rasterize(pdf_path, first, last, dpi)
+            for offset in range(len(images)):
+                block, shared = _share(images[offset])
+                images[offset] = None
+                future = executor.submit(_recognize_shared, shared, with_confidence)
+
+                def cleanup(block=block):
+                    block.close()
+                    block.unlink()
+                _release_when_done(future, size, cleanup)
+                submitted += 1
+                futures[first + offset] = future
+        else:
+            paths = rasterize(pdf_path, first, last, dpi, output_folder=spool_dir)
+            for offset, path in enumerate(paths):
+                future = executor.submit(_recognize_path, path, with_confidence)
+                _release_when_done(future, size, lambda path=path: _remove_quietly(path))
+                submitted += 1
+                futures[first + offset] = future
+    finally:
+        # Pages that were never queued give their share back now
+        unused = (last - first + 1) - submitted
+        if unused > 0:
+            budget.release(unused * size)
+    return futures
+
+
+def _ocr_pass(pdf_path, page_indices, dpi, with_confidence):
+    """Rasterize and recognize pages at one resolution.
+
+    Pages are rasterized in batches that fit the OCR_MEMORY_MB budget, and
+    each batch waits for budget freed by earlier pages, from any request.
+    Returns a dict of page_index -> (text, confidence).
+    """
+    executor = get_executor()
+    size = page_bytes(dpi)
+    batch_pages = max(1, budget.limit // size)
+    spool_dir = tempfile.mkdtemp(prefix='ocr-') if OCR_RASTER != 'memory' else None
+    futures = {}
+    try:
+        for first, last in batches(page_indices, batch_pages):
+            budget.acquire((last - first + 1) * size)
+            futures.update(_submit_batch(executor, pdf_path, first, last, dpi, with_confidence, spool_dir))
+        return {index: future.result() for index, future in futures.items()}
+    finally:
+        for future in futures.values():
+            future.cancel()
+        if spool_dir is not None:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def ocr_pages(pdf_path, page_indices, confidences=None):
+    """OCR the given pages in the process pool.
+
+    With OCR_TIERED, every page is first read at OCR_FAST_DPI and only pages
+    below OCR_MIN_CONFIDENCE (or with no words) are read again at
+    OCR_ESCALATION_DPI; the higher-confidence reading is kept. If given,
+    `confidences` is filled with page_index -> [(pass, confidence), ...].
+    Returns a dict of page_index -> text; callers read it back in page order.
+    """
+    if not page_indices:
+        return {}
+    confidences = confidences if confidences is not None else {}
+    if not OCR_TIERED:
+        results = _ocr_pass(pdf_path, page_indices, OCR_DPI, False)
+        return {index: text + "\n" for index, (text, _) in results.items()}
+
+    results = _ocr_pass(pdf_path, page_indices, OCR_FAST_DPI, True)
+    for index, (_, confidence) in results.items():
+        confidences[index] = [('fast', confidence)]
+    low = sorted(index for index, (_, confidence) in results.items()
+                 if confidence is None or confidence < OCR_MIN_CONFIDENCE)
+    if low:
+        for index, (text, confidence) in _ocr_pass(pdf_path, low, OCR_ESCALATION_DPI, True).items():
+            confidences[index].append(('escalated', confidence))
+            if confidence is not None and (results[index][1] is None or confidence >= results[index][1]):
+                results[index] = (text, confidence)
+    with _stats_lock:
+        _stats['pages'] += len(results)
+        _stats['escalated'] += len(low)
+    return {index: text + "\n" for index, (text, _) in results.items()}
+
+
+def stats():
+    """Tiered OCR counters; escalation_rate is the share of pages read twice."""
+    with _stats_lock:
+        result = dict(_stats)
+    result['escalation_rate'] = result['escalated'] / result['pages'] if result['pages'] else 0.0
+    return result
@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+import extraction_cache
+import ocr
+
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', '0')) or os.cpu_count() or 1
+# Files of one request parsed at once, so one large batch cannot hold every worker
+PARSE_REQUEST_WORKERS = int(os.getenv('PARSE_REQUEST_WORKERS', '2'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process pool shared by every request; created on the first multi-file upload."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=ocr.pool_context())
+        return _executor
+
+
+def iter_page_texts(pdf_path, digest):
+    """Yield (text, seconds) for every page; text is None where OCR is needed."""
+    start = time.perf_counter()
+    with open(pdf_path, 'rb') as file:
+        reader = PdfReader(file)
+        for index in range(len(reader.pages)):
+            page_text = extraction_cache.get_page(digest, index)
+            if page_text is None:
+                page_text = reader.pages[index].extract_text()
+                if not page_text.strip():
+                    page_text = None
+                else:
+                    page_text += "\n"
+                    extraction_cache.put_page(digest, index, page_text)
+            yield page_text, time.perf_counter() - start
+            start = time.perf_counter()
+
+
+def parse_pdf(pdf_path, digest):
+    """Parse a whole PDF in a pool worker.
+
+    Returns the (text, seconds) pages and this call's extraction cache
+    counters, which only the worker process saw.
+    """
+    before = extraction_cache.stats()
+    pages = list(iter_page_texts(pdf_path, digest))
+    after = extraction_cache.stats()
+    return pages, {key: after[key] - before[key] for key in ('hits', 'misses', 'evictions')}
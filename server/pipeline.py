@@ -0,0 +1,68 @@
+import os
+import queue
+import threading
+import time
+
+import metrics
+
+PAGE_QUEUE_SIZE = int(os.getenv('PAGE_QUEUE_SIZE', '8'))
+CHUNK_QUEUE_SIZE = int(os.getenv('CHUNK_QUEUE_SIZE', '2'))
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, error):
+        self.error = error
+
+
+def staged(items, maxsize, name='stage', timings=None):
+    """Run an iterable in a background thread behind a bounded queue.
+
+    The producer blocks once `maxsize` items are waiting, which keeps memory
+    flat when the consumer (e.g. the LLM stage) is the bottleneck. Errors in
+    the producer are re-raised in the consumer, and closing the consumer
+    early stops the producer. With `timings`, the time the consumer spends
+    blocked on an empty queue is exported as queue wait.
+    """
+    buffer = queue.Queue(maxsize=max(1, maxsize))
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_StageError(e))
+            return
+        put(_DONE)
+
+    worker = threading.Thread(target=produce, name=f"pipeline-{name}", daemon=True)
+    worker.start()
+
+    def consume():
+        try:
+            while True:
+                start = time.perf_counter()
+                item = buffer.get()
+                if timings is not None:
+                    timings.observe(metrics.QUEUE_WAIT_SECONDS, time.perf_counter() - start, queue=name)
+                if item is _DONE:
+                    return
+                if isinstance(item, _StageError):
+                    raise item.error
+                yield item
+        finally:
+            stopped.set()
+
+    return consume()
@@ -1,6 +1,6 @@
 import os
+import sys
 import time
-import requests
 from flask import Flask, jsonify, request
 from werkzeug.utils import secure_filename
 from PyPDF2 import PdfReader
@@ -10,10 +10,18 @@ from PIL import Image
 from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# Shared pooled LLM client lives one directory up, next to server.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_backends
+import llm_client
+
 load_dotenv()
 
 app = Flask(__name__)
 
+# Ollama /api/chat unless overridden with LLM_BACKEND / LLM_BASE_URL
+llm_backend = llm_backends.create_backend(os.getenv('LLM_BACKEND', 'ollama-chat'))
+
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
@@ -141,26 +149,19 @@ def generate_podcast(text):
                     "content": f"CHUNK {idx + 1}:\n{chunk}"
                 })
                 
-                response = requests.post(
-                    'http://localhost:11434/api/chat',
-                    json={
-                        "model": "llama3:latest",
-                        "messages": conversation[-3:],  # keep references short
-                        "options": {"temperature": 0.2}
-                    },
-                    timeout=30
-                )
-                
-                if not response.ok:
-                    raise Exception(f"Chunk {idx + 1} error: {response.text}")
-                
-                resp_json = response.json()
-                if 'message' not in resp_json or 'content' not in resp_json['message']:
-                    raise Exception(f"Missing 'content' in chunk {idx + 1} response.")
+                try:
+                    content = llm_backend.chat(
+                        "llama3:latest",
+                        conversation[-3:],  # keep references short
+                        {"temperature": 0.2},
+                        timeout=(llm_client.LLM_CONNECT_TIMEOUT, 30)
+                    )
+                except llm_backends.BackendError as e:
+                    raise Exception(f"Chunk {idx + 1} error: {e}")
                 
                 conversation.append({
                     "role": "assistant",
-                    "content": resp_json['message']['content']
+                    "content": content
                 })
             
             # Finally, request a single combined podcast script:
@@ -176,27 +177,19 @@ def generate_podcast(text):
                             Style: Academic yet engaging"""
             })
             
-            final_response = requests.post(
-                'http://localhost:11434/api/chat',
-                json={
-                    "model": "llama3:latest",
-                    "messages": [conversation[0], conversation[-1]],
-                    "options": {
+            try:
+                return llm_backend.chat(
+                    "llama3:latest",
+                    [conversation[0], conversation[-1]],
+                    {
                         "temperature": 0.6,
                         "max_tokens": 8000,
                         "top_p": 0.85
-                    }
-                },
-                timeout=60
-            )
-            
-            if final_response.ok:
-                final_json = final_response.json()
-                if 'message' in final_json and 'content' in final_json['message']:
-                    return final_json['message']['content']
-                else:
-                    raise Exception("Final response missing 'content' field.")
-            raise Exception("Final generation failed.")
+                    },
+                    timeout=(llm_client.LLM_CONNECT_TIMEOUT, 60)
+                )
+            except llm_backends.BackendError as e:
+                raise Exception(f"Final generation failed: {e}")
         
         except Exception as e:
             print(f"Attempt {attempt + 1} failed: {e}")
@@ -1,18 +1,26 @@
 import os
+import threading
+import sys
 import time
-import requests
 from flask import Flask, jsonify, request
 from werkzeug.utils import secure_filename
 from PyPDF2 import PdfReader
 from pdf2image import convert_from_path
-import easyocr
 from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+# Shared pooled LLM client lives one directory up, next to server.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_backends
+import llm_client
+
 load_dotenv()
 
 app = Flask(__name__)
 
+# Ollama /api/chat unless overridden with LLM_BACKEND / LLM_BASE_URL
+llm_backend = llm_backends.create_backend(os.getenv('LLM_BACKEND', 'ollama-chat'))
+
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
@@ -23,8 +31,18 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Initialize EasyOCR reader for English (add more languages as needed)
-ocr_reader = easyocr.Reader(['en'], gpu=False)
+# EasyOCR reader for English (add more languages as needed), created on first
+# scanned page rather than at import
+_ocr_reader = None
+_ocr_reader_lock = threading.Lock()
+
+def get_ocr_reader():
+    global _ocr_reader
+    with _ocr_reader_lock:
+        if _ocr_reader is None:
+            import easyocr
+            _ocr_reader = easyocr.Reader(['en'], gpu=False)
+        return _ocr_reader
 
 def allowed_file(filename):
     """
@@ -50,7 +68,7 @@ def process_page(page, pdf_path, page_index):
         # Use EasyOCR on all images (usually there's just one per page)
         ocr_text_parts = []
         for img in images:
-            ocr_result = ocr_reader.readtext(img, detail=0)
+            ocr_result = get_ocr_reader().readtext(img, detail=0)
             # detail=0 returns just the extracted text (list of strings).
             if ocr_result:
                 # Join any recognized text into a single chunk
@@ -129,26 +147,19 @@ def generate_podcast(text):
                     "content": f"CHUNK {idx+1}:\n{chunk}"
                 })
                 
-                response = requests.post(
-                    'http://localhost:11434/api/chat',
-                    json={
-                        "model": "llama3:latest",
-                        "messages": conversation[-3:],  # Keep last 3 messages for context
-                        "options": {"temperature": 0.2}
-                    },
-                    timeout=30
-                )
-                
-                if not response.ok:
-                    raise Exception(f"Chunk {idx+1} error: {response.text}")
-                
-                resp_json = response.json()
-                if 'message' not in resp_json or 'content' not in resp_json['message']:
-                    raise Exception(f"Chunk {idx+1} response missing 'content' field.")
+                try:
+                    content = llm_backend.chat(
+                        "llama3:latest",
+                        conversation[-3:],  # Keep last 3 messages for context
+                        {"temperature": 0.2},
+                        timeout=(llm_client.LLM_CONNECT_TIMEOUT, 30)
+                    )
+                except llm_backends.BackendError as e:
+                    raise Exception(f"Chunk {idx+1} error: {e}")
                 
                 conversation.append({
                     "role": "assistant",
-                    "content": resp_json['message']['content']
+                    "content": content
                 })
             
             # Final request for a combined script
@@ -164,28 +175,19 @@ def generate_podcast(text):
                             Style: Academic yet engaging"""
             })
             
-            final_response = requests.post(
-                'http://localhost:11434/api/chat',
-                json={
-                    "model": "llama3:latest",
-                    "messages": [conversation[0], conversation[-1]],  # System prompt and final request
-                    "options": {
+            try:
+                return llm_backend.chat(
+                    "llama3:latest",
+                    [conversation[0], conversation[-1]],  # System prompt and final request
+                    {
                         "temperature": 0.6,
                         "max_tokens": 8000,
                         "top_p": 0.85
-                    }
-                },
-                timeout=60
-            )
-            
-            if final_response.ok:
-                final_json = final_response.json()
-                if 'message' in final_json and 'content' in final_json['message']:
-                    return final_json['message']['content']
-                else:
-                    raise Exception("Final response missing 'content' field.")
-            
-            raise Exception("Final generation failed.")
+                    },
+                    timeout=(llm_client.LLM_CONNECT_TIMEOUT, 60)
+                )
+            except llm_backends.BackendError as e:
+                raise Exception(f"Final generation failed: {e}")
         
         except Exception as e:
             print(f"Attempt {attempt+1} failed: {str(e)}")
@@ -1,22 +1,32 @@
 import os
-import requests
+import sys
 from flask import Flask, jsonify, request
 from PyPDF2 import PdfReader
 from dotenv import load_dotenv
 import uuid
-import time
 from concurrent.futures import ThreadPoolExecutor
 
+# Shared pooled LLM client lives one directory up, next to server.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_backends
+import llm_client
+
 load_dotenv()
 
 app = Flask(__name__)
 
 # Configuration
-API_URL = "https://api.groq.com/v1/chat/completions"  # Hypothetical ChatGroq API endpoint
-HEADERS = {
-    "Authorization": f"Bearer {os.getenv('GROQ_API_KEY')}",  # Replace with your actual ChatGroq API key
-    "Content-Type": "application/json"
-}
+API_BASE_URL = "https://api.groq.com/v1"  # Hypothetical ChatGroq API endpoint
+# OpenAI-compatible /chat/completions; set LLM_BACKEND to point the agents elsewhere
+llm_backend = llm_backends.create_backend(
+    os.getenv('LLM_BACKEND', 'openai'),
+    base_url=os.getenv('LLM_BASE_URL', API_BASE_URL),
+    api_key=os.getenv('GROQ_API_KEY')  # Replace with your actual ChatGroq API key
+)
+# Chunks whose extractor -> analyst agents run at once. Every thread shares
+# llm_client's per-host rate limiter (LLM_RATE_LIMIT requests/second), and a
+# 429/503 pauses all of them together for the server's Retry-After.
+AGENT_CONCURRENCY = int(os.getenv('AGENT_CONCURRENCY', '8'))
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
 
@@ -75,40 +85,23 @@ def query_agent(prompt, agent_type, max_retries=5):
     Implements retry logic for handling transient errors.
     """
     formatted_prompt = format_prompt(agent_type, prompt)
-    payload = {
-        "model": AGENTS[agent_type],
-        "messages": [
-            {"role": "user", "content": formatted_prompt}
-        ],
+    messages = [
+        {"role": "user", "content": formatted_prompt}
+    ]
+    options = {
         "max_tokens": 500,
         "temperature": 0.5
     }
 
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(API_URL, headers=HEADERS, json=payload)
-            if response.status_code == 200:
-                result = response.json()
-                # Assuming the API returns a JSON with 'choices' similar to OpenAI
-                return result['choices'][0]['message']['content'].strip()
-            elif response.status_code == 429:
-                # Rate limit exceeded, wait and retry
-                wait_time = (attempt + 1) * 10
-                print(f"Rate limit exceeded. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                continue
-            elif response.status_code == 503:
-                # Service unavailable, wait and retry
-                wait_time = (attempt + 1) * 10
-                print(f"Service unavailable. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                continue
-            else:
-                print(f"API Error ({response.status_code}): {response.text}")
-                return None
-        except Exception as e:
-            print(f"Connection Error: {str(e)}. Retrying...")
-            time.sleep(5)
+    try:
+        # llm_client retries 429/503 after a backoff shared by every agent thread
+        content = llm_backend.chat(AGENTS[agent_type], messages, options,
+                                   retries=max_retries - 1)
+        return content.strip()
+    except llm_backends.BackendError as e:
+        print(f"API Error: {str(e)}")
+    except Exception as e:
+        print(f"Connection Error: {str(e)}")
     return None
 
 def process_chunk(chunk, chunk_num, total_chunks):
@@ -153,14 +146,15 @@ def process_local_pdfs():
         chunks = chunk_text(combined_text)
 
         processed_chunks = []
-        # Using ThreadPoolExecutor to handle multiple chunks concurrently
-        with ThreadPoolExecutor(max_workers=5) as executor:
+        # Chunks are independent; the rate limiter, not the pool, paces the API
+        with ThreadPoolExecutor(max_workers=AGENT_CONCURRENCY) as executor:
             futures = [executor.submit(process_chunk, chunk, i+1, len(chunks)) for i, chunk in enumerate(chunks)]
-            for future in futures:
+            for i, future in enumerate(futures):
                 result = future.result()
                 if result:
                     processed_chunks.append(result)
-                print(f"Processed chunk {futures.index(future)+1}/{len(futures)}")
+                print(f"Processed chunk {i+1}/{len(futures)}")
+        print(f"LLM client: {llm_client.stats()}")
 
         podcast_script = generate_podcast_script(processed_chunks)
 
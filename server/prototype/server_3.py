@@ -8,7 +8,6 @@ from pdf2image import convert_from_path
 from PIL import Image
 import requests
 from concurrent.futures import ThreadPoolExecutor
-from transformers import AutoTokenizer
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -27,8 +26,15 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 POPPLER_PATH = os.getenv('POPPLER_PATH', 'C:/Users/Lenovo/Downloads/Release-24.08.0-0/poppler-24.08.0/Library/bin')
 TESSDATA_PREFIX = os.getenv('TESSDATA_PREFIX', 'C:/Program Files/Tesseract-OCR/tessdata')
 
-# Initialize tokenizer
-tokenizer = AutoTokenizer.from_pretrained("meta-llama/Meta-Llama-3-8B")
+# Tokenizer is loaded on first use, not at import
+_tokenizer = None
+
+def get_tokenizer():
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+        _tokenizer = AutoTokenizer.from_pretrained("meta-llama/Meta-Llama-3-8B")
+    return _tokenizer
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -73,6 +79,7 @@ def extract_text_from_pdf(pdf_path):
     return text
 
 def chunk_text(text, chunk_size=3000, overlap=500):
+    tokenizer = get_tokenizer()
     tokens = tokenizer.encode(text)
     chunks = []
     
@@ -1,10 +1,16 @@
 import os
+import sys
 import requests
 import time
 from flask import Flask, jsonify, request
 from werkzeug.utils import secure_filename
 from PyPDF2 import PdfReader
 
+# Shared pooled LLM client lives one directory up, next to server.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import llm_backends
+import llm_client
+
 app = Flask(__name__)
 
 # Configuration
@@ -20,6 +26,9 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Ollama /api/chat unless overridden with LLM_BACKEND / LLM_BASE_URL
+llm_backend = llm_backends.create_backend(os.getenv('LLM_BACKEND', 'ollama-chat'))
+
 class ProgressLogger:
     def __init__(self):
         self.start_time = time.time()
@@ -67,36 +76,29 @@ def chunk_text(text, logger):
 
 def ollama_chat(messages, logger, max_retries=3):
     """Robust API communication with timeout handling"""
-    for attempt in range(max_retries):
-        try:
-            logger.log(f"API Attempt {attempt+1} with {len(messages)} messages")
-            response = requests.post(
-                'http://localhost:11434/api/chat',
-                json={
-                    "model": "llama3.2:latest",
-                    "messages": messages,
-                    "stream": False,
-                    "options": {"temperature": 0.5}
-                },
-                timeout=OLLAMA_TIMEOUT
-            )
-            
-            if response.status_code == 200:
-                logger.log("API call successful")
-                return response.json()['message']['content']
-            
-            logger.log(f"API error: {response.status_code} - {response.text}")
-            
-        except requests.exceptions.Timeout:
-            logger.log("API timeout occurred")
-        except Exception as e:
-            logger.log(f"API connection error: {str(e)}")
-        
-        if attempt < max_retries-1:
-            time.sleep(2 ** attempt)  # Exponential backoff
-    
-    logger.log("API request failed after retries")
-    return None
+    logger.log(f"API call with {len(messages)} messages")
+    try:
+        # llm_client retries connection errors and 429/5xx with jittered backoff
+        content = llm_backend.chat(
+            "llama3.2:latest",
+            messages,
+            {"temperature": 0.5},
+            timeout=(llm_client.LLM_CONNECT_TIMEOUT, OLLAMA_TIMEOUT),
+            retries=max_retries - 1
+        )
+    except requests.exceptions.Timeout:
+        logger.log("API timeout occurred")
+        return None
+    except llm_backends.BackendError as e:
+        logger.log(f"API error: {str(e)}")
+        logger.log("API request failed after retries")
+        return None
+    except Exception as e:
+        logger.log(f"API connection error: {str(e)}")
+        return None
+
+    logger.log("API call successful")
+    return content
 
 def generate_podcast(text, logger):
     """Full generation pipeline with logging"""
@@ -0,0 +1,88 @@
+"""BM25 salience ranking of chunks, to fit a per-duration input budget.
+
+The opening chunks are sent on as they arrive, up to SELECTION_LEAD_SHARE
+of the budget, so the LLM can start before the whole upload is read. All
+later chunks are scored against the terms of the opening words of the
+upload (title and abstract), weighted up towards the start and end of the
+text where introductions and conclusions sit, and the best ones that fit
+the rest of the budget are kept in document order.
+"""
+import math
+import os
+import re
+from collections import Counter
+
+CHUNK_SELECTION = os.getenv('CHUNK_SELECTION', '1') != '0'
+# Input tokens sent to the LLM per request in iterative mode
+DURATION_TOKEN_BUDGET = {
+    'small': int(os.getenv('SELECTION_TOKENS_SMALL', '6000')),
+    'moderate': int(os.getenv('SELECTION_TOKENS_MODERATE', '12000')),
+    'lengthy': int(os.getenv('SELECTION_TOKENS_LENGTHY', '24000'))
+}
+# Share of the budget sent in document order before the rest is ranked; the
+# first chunk is always sent
+SELECTION_LEAD_SHARE = float(os.getenv('SELECTION_LEAD_SHARE', '0.2'))
+QUERY_WORDS = 250  # opening words used as the query
+POSITION_WEIGHT = 0.25  # boost for the first and last chunks, fading to none mid-text
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD = re.compile(r'[a-z][a-z0-9-]+')
+STOPWORDS = frozenset("""
+about above after again against all also among and any are because been before being below between
+both but can could did does doing down during each few for from further had has have having her here
+hers him his how however into its itself may more most much must not now off once only other our ours
+out over own same she should some such than that the their theirs them then there these they this
+those through too under until upon very was were what when where which while who whom why will with
+within without would you your et al fig figure table section paper using used use based shown show
+""".split())
+
+
+def terms(text):
+    return [word for word in WORD.findall(text.lower()) if len(word) > 2 and word not in STOPWORDS]
+
+
+def bm25_scores(documents, query):
+    """BM25 score of every term list in `documents` for the `query` terms."""
+    count = len(documents)
+    average_length = sum(len(document) for document in documents) / count or 1.0
+    frequency = Counter(term for document in documents for term in set(document))
+    weights = {term: math.log(1 + (count - frequency[term] + 0.5) / (frequency[term] + 0.5))
+               for term in set(query) if frequency[term]}
+    scores = []
+    for document in documents:
+        counts = Counter(document)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(document) / average_length)
+        scores.append(sum(weight * counts[term] * (BM25_K1 + 1) / (counts[term] + norm)
+                          for term, weight in weights.items() if counts[term]))
+    return scores
+
+
+def position_weight(index, count):
+    if count <= 1:
+        return 1.0
+    return 1.0 + POSITION_WEIGHT * abs(2 * index / (count - 1) - 1)
+
+
+def select(texts, budget, tokens, kept=1):
+    """Indices of the chunks to send, in document order, and their tokens.
+
+    `tokens` holds the token count of every text. The first `kept` chunks
+    (at least the title and abstract) were already sent and count against
+    `budget`; the rest are taken by descending salience while they fit.
+    """
+    kept = max(1, min(kept, len(texts)))
+    if sum(tokens) <= budget:
+        return list(range(len(texts))), sum(tokens)
+    documents = [terms(text) for text in texts]
+    query = terms(' '.join(texts[0].split()[:QUERY_WORDS]))
+    scores = bm25_scores(documents, query)
+    ranked = sorted(range(kept, len(texts)), key=lambda i: scores[i] * position_weight(i, len(texts)),
+                    reverse=True)
+    selected = list(range(kept))
+    used = sum(tokens[:kept])
+    for index in ranked:
+        if used + tokens[index] <= budget:
+            selected.append(index)
+            used += tokens[index]
+    return sorted(selected), used
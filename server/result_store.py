@@ -0,0 +1,165 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+RESULT_STORE = os.getenv('RESULT_STORE', 'sqlite')  # 'sqlite' or 'memory'
+RESULT_STORE_PATH = os.getenv(
+    'RESULT_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'results.sqlite3')
+)
+RESULT_TTL = int(os.getenv('RESULT_TTL', str(7 * 24 * 3600)))  # seconds
+RESULT_MAX_ENTRIES = int(os.getenv('RESULT_MAX_ENTRIES', '10000'))
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '256'))
+
+
+class MemoryStore:
+    """Bounded in-process LRU with TTL expiry.
+
+    Used on its own for single-worker setups and as the read-through front of
+    SQLiteStore.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires_at=None):
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._items[key] = (expires_at, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteStore:
+    """Results shared by every worker process through an embedded SQLite file.
+
+    `table` lets other records (e.g. job progress) share the file; with a
+    `cache_size` of 0 every read goes to the file, for values that change.
+    """
+
+    def __init__(self, path, max_entries, ttl, cache_size, table='results'):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.table = table
+        self._front = MemoryStore(cache_size, ttl)
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                ' id TEXT PRIMARY KEY,'
+                ' data TEXT NOT NULL,'
+                ' created_at REAL NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_created ON {table} (created_at)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            # WAL lets readers in other workers proceed while one writes
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        value = self._front.get(key)
+        if value is not None:
+            return value
+        row = self._connection().execute(
+            f'SELECT data, expires_at FROM {self.table} WHERE id = ? AND expires_at >= ?',
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return default
+        value = json.loads(row[0])
+        self._front.put(key, value, row[1])
+        return value
+
+    def put(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._connection() as conn:
+            conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (id, data, created_at, expires_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now, expires_at)
+            )
+            conn.execute(f'DELETE FROM {self.table} WHERE expires_at < ?', (now,))
+            conn.execute(
+                f'DELETE FROM {self.table} WHERE id IN ('
+                f' SELECT id FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+        self._front.put(key, value, expires_at)
+
+    def __len__(self):
+        return self._connection().execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+
+class ResultStore:
+    """Dict-style facade so callers can keep using store[result_id]."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __setitem__(self, key, value):
+        self.backend.put(key, value)
+
+    def __getitem__(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.backend.get(key) is not None
+
+    def get(self, key, default=None):
+        return self.backend.get(key, default)
+
+    def __len__(self):
+        return len(self.backend)
+
+
+def create_result_store():
+    if RESULT_STORE == 'memory':
+        return ResultStore(MemoryStore(RESULT_MAX_ENTRIES, RESULT_TTL))
+    if RESULT_STORE == 'sqlite':
+        return ResultStore(SQLiteStore(RESULT_STORE_PATH, RESULT_MAX_ENTRIES,
+                                       RESULT_TTL, RESULT_CACHE_SIZE))
+    raise ValueError(f"Unknown RESULT_STORE backend: {RESULT_STORE}")
+
+
+def create_job_store(ttl):
+    """Job progress, in the same backend as results so any worker can report it."""
+    if RESULT_STORE == 'memory':
+        return ResultStore(MemoryStore(RESULT_MAX_ENTRIES, ttl))
+    if RESULT_STORE == 'sqlite':
+        return ResultStore(SQLiteStore(RESULT_STORE_PATH, RESULT_MAX_ENTRIES, ttl, 0, table='jobs'))
+    raise ValueError(f"Unknown RESULT_STORE backend: {RESULT_STORE}")
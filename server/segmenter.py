@@ -0,0 +1,106 @@
+"""Single-pass sentence segmentation over character offsets.
+
+Sentences and chunks are (start, end) spans into the source text, each with a
+precomputed word count. Chunk text is only copied out when it is sent to the
+LLM.
+"""
+import re
+from collections import namedtuple
+from contextlib import nullcontext
+from itertools import chain
+
+# End of a sentence: '.' or '?' before whitespace, except after initials
+# ("e.g.") and short abbreviations ("Dr."). The literal is matched first, so
+# the lookbehinds only run at candidate boundaries instead of at every offset.
+SENTENCE_END = re.compile(r'[.?](?<!\w\.\w.)(?<![A-Z][a-z]\.)(?=\s)')
+
+
+class Span(namedtuple('Span', ['source', 'start', 'end', 'words'])):
+    """A chunk of `source`; str(span) slices it."""
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return self.source[self.start:self.end]
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"Span(start={self.start}, end={self.end}, words={self.words})"
+
+
+def sentence_spans(text, start=0, final=True):
+    """Yield (start, end, words) for each sentence of text[start:].
+
+    The whitespace character after a sentence belongs to neither sentence.
+    With final=False the trailing, possibly unfinished sentence is left out.
+    """
+    for match in SENTENCE_END.finditer(text, start):
+        end = match.end()
+        yield start, end, len(text[start:end].split())
+        start = end + 1
+    if final:
+        yield start, len(text), len(text[start:].split())
+
+
+def iter_sentences(pieces, timings=None):
+    """Split a stream of text pieces into sentence strings.
+
+    Only the trailing, possibly unfinished sentence is carried between pieces.
+    """
+    tail = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        with timings.stage('chunk') if timings is not None else nullcontext():
+            text = tail + piece
+            spans = list(sentence_spans(text, final=False))
+        position = 0
+        for start, end, _ in spans:
+            yield text[start:end]
+            position = end + 1
+        tail = text[position:]
+    yield tail
+
+
+def iter_chunks(pieces, chunk_size, timings=None):
+    """Pack a stream of text pieces into Spans of at most chunk_size words.
+
+    A sentence longer than chunk_size becomes a chunk of its own. Between
+    pieces only the open chunk and the unfinished sentence are kept.
+    """
+    buffer = ""
+    position = 0  # start of the unfinished sentence in buffer
+    start = None  # start of the open chunk in buffer
+    end = words = 0
+    for piece in chain(pieces, [None]):
+        final = piece is None  # flush the last sentence
+        if not final and not piece:
+            continue
+        with timings.stage('chunk') if timings is not None else nullcontext():
+            if not final:
+                keep = position if start is None else start
+                buffer = buffer[keep:] + piece
+                position -= keep
+                end -= keep
+                start = None if start is None else 0
+            sentences = list(sentence_spans(buffer, position, final))
+        for sentence_start, sentence_end, sentence_words in sentences:
+            position = sentence_end + 1
+            if not sentence_words:
+                continue
+            if start is not None and words + sentence_words > chunk_size:
+                yield Span(buffer, start, end, words)
+                start = None
+            if start is None:
+                start, words = sentence_start, 0
+            end = sentence_end
+            words += sentence_words
+    if start is not None:
+        yield Span(buffer, start, end, words)
+
+
+def chunk_spans(text, chunk_size):
+    """Chunk an in-memory text; returns a list of Spans into `text`."""
+    return list(iter_chunks([text], chunk_size))
@@ -1,79 +1,255 @@
 import os
-import pytesseract
-from flask import Flask, jsonify, request
+from flask import Flask, Request, Response, jsonify, request, stream_with_context
 from werkzeug.utils import secure_filename
-from PyPDF2 import PdfReader
-from pdf2image import convert_from_path
-from PIL import Image
-import requests
 from dotenv import load_dotenv
 import uuid
+import json
 import re
-import tempfile
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from flask_cors import CORS 
+import extraction_cache
+import uploads
+import ocr
+import pdf_text
+import pipeline
+import dedup
+import boilerplate
+import relevance
+import segmenter
+import result_store
+import metrics
+import token_budget
+from timings import StageTimings
+import llm_cache
+import llm_client
+import llm_backends
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
 # Configuration
-UPLOAD_FOLDER = tempfile.mkdtemp()
+UPLOAD_FOLDER = uploads.UPLOAD_DIR
 ALLOWED_EXTENSIONS = {'pdf'}
+DEFAULT_MODEL = 'mistral:7b-instruct'
 MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
-results_storage = {}
+results_storage = result_store.create_result_store()
+# Selected with LLM_BACKEND / LLM_BASE_URL / LLM_API_KEY
+llm_backend = llm_backends.create_backend()
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# OCR and parse pool workers re-import this file as __mp_main__; they must
+# not start the server's background threads
+IN_POOL_WORKER = __name__ == '__mp_main__'
+if not IN_POOL_WORKER:
+    uploads.start_sweeper()
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf(pdf_path):
-    text = ""
+class UploadRequest(Request):
+    """Streams PDF parts of a multipart body straight into the upload area.
+
+    Other parts keep werkzeug's default temporary storage and are ignored.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_spools = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not filename or not allowed_file(filename):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        spool = uploads.Spool(secure_filename(filename) or 'upload.pdf')
+        self.upload_spools.append(spool)
+        return spool
+
+app.request_class = UploadRequest
+
+@app.teardown_request
+def discard_unclaimed_uploads(exc):
+    # Spools of a request that failed before save_uploads, e.g. a rejected file
+    for spool in getattr(request, 'upload_spools', ()):
+        if not spool.claimed:
+            spool.discard()
+
+@app.errorhandler(uploads.InvalidUpload)
+@app.errorhandler(uploads.UploadQuotaExceeded)
+def upload_error(e):
+    return jsonify({'error': e.description}), e.code
+
+def _ocr_run(pdf_path, digest, indices, timings):
+    """OCR one run of scanned pages; returns [(index, text)] in page order.
+
+    Runs on an ocr.dispatch thread while the document is parsed further.
+    """
+    start = time.perf_counter()
+    confidences = {}
+    with timings.stage('ocr'):
+        ocr_texts = sorted(ocr.ocr_pages(pdf_path, indices, confidences).items())
+    per_page = (time.perf_counter() - start) / max(1, len(indices))
+    for _ in indices:
+        timings.observe(metrics.PAGE_EXTRACTION_SECONDS, per_page, method='ocr')
+    for passes in confidences.values():
+        for ocr_pass, confidence in passes:
+            if confidence is not None:
+                timings.observe(metrics.OCR_PAGE_CONFIDENCE, confidence, ocr_pass=ocr_pass)
+    for index, page_text in ocr_texts:
+        extraction_cache.put_page(digest, index, page_text)
+    return ocr_texts
+
+def _drain_pages(pdf_path, window, limit):
+    """Yield pages from the head of `window` in page order.
+
+    Entries are (page_count, pages), where pages is a list of (index, text)
+    or the Future of an OCR run. A run still in progress is only waited for
+    while more than `limit` pages are buffered.
+    """
+    while window:
+        _, pages = window[0]
+        if not isinstance(pages, list):
+            if not pages.done() and sum(count for count, _ in window) <= limit:
+                return
+            pages = pages.result()
+        window.popleft()
+        for index, page_text in pages:
+            yield pdf_path, index + 1, page_text
+
+def pdf_digest(path):
+    # Uploads are hashed while spooled; other paths are read again
+    return uploads.digest(path) or extraction_cache.file_digest(path)
+
+def iter_pdf_pages(pdf_path, timings=None, prefetched=None):
+    """Yield (file, page_no, text) for every page of a PDF, in page order.
+
+    `prefetched` is a (digest, future) pair from prefetch_pdfs when the file
+    is being parsed in the parse pool; otherwise pages are parsed here, one
+    at a time.
+    """
+    timings = timings if timings is not None else StageTimings()
     try:
-        with open(pdf_path, 'rb') as file:
-            reader = PdfReader(file)
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text.strip():
-                    text += page_text + "\n"
-                else:
-                    images = convert_from_path(pdf_path, 
-                                             first_page=page.page_number+1,
-                                             last_page=page.page_number+1)
-                    for image in images:
-                        text += pytesseract.image_to_string(image) + "\n"
+        if prefetched is not None:
+            digest, future = prefetched
+            start = time.perf_counter()
+            pages, cache_counts = future.result()
+            timings.observe(metrics.QUEUE_WAIT_SECONDS, time.perf_counter() - start, queue='parse')
+            extraction_cache.add_counts(cache_counts)
+        else:
+            with timings.stage('parse'):
+                digest = pdf_digest(pdf_path)
+                cached_pages = extraction_cache.get_document(digest)
+            if cached_pages is not None:
+                print(f"Extraction cache hit: {os.path.basename(pdf_path)}")
+                for index, page_text in enumerate(cached_pages):
+                    yield pdf_path, index + 1, page_text
+                return
+            pages = pdf_text.iter_page_texts(pdf_path, digest)
+
+        # Runs of scanned pages are OCR'd in the background while parsing
+        # goes on, up to OCR_LOOKAHEAD_PAGES ahead of the oldest one
+        window = deque()
+        pending_ocr = []
+        ocr_page_count = 0
+        page_count = 0
+        for index, (page_text, seconds) in enumerate(pages):
+            page_count += 1
+            timings.add('parse', seconds)
+            if page_text is None:
+                pending_ocr.append(index)
+                ocr_page_count += 1
+                if len(pending_ocr) < ocr.OCR_LOOKAHEAD_PAGES:
+                    continue
+            else:
+                timings.observe(metrics.PAGE_EXTRACTION_SECONDS, seconds, method='text')
+            if pending_ocr:
+                window.append((len(pending_ocr), ocr.dispatch(_ocr_run, pdf_path, digest, pending_ocr, timings)))
+                pending_ocr = []
+            if page_text is not None:
+                window.append((1, [(index, page_text)]))
+            yield from _drain_pages(pdf_path, window, ocr.OCR_LOOKAHEAD_PAGES)
+        if pending_ocr:
+            window.append((len(pending_ocr), ocr.dispatch(_ocr_run, pdf_path, digest, pending_ocr, timings)))
+        yield from _drain_pages(pdf_path, window, 0)
+        extraction_cache.put_document(digest, page_count)
+        timings.observe(metrics.OCR_PAGES_PER_DOCUMENT, ocr_page_count)
     except Exception as e:
         print(f"Error processing PDF: {str(e)}")
-    return text
+
+def prefetch_pdfs(pdf_paths, timings=None):
+    """Yield (path, prefetched) in upload order for iter_pdf_pages.
+
+    With several files, up to PARSE_REQUEST_WORKERS uncached files are parsed
+    ahead in the shared parse pool while earlier ones are consumed. A single
+    file, or a cached one, is left to iter_pdf_pages (prefetched is None).
+    """
+    if len(pdf_paths) < 2 or pdf_text.PARSE_REQUEST_WORKERS < 1:
+        for path in pdf_paths:
+            yield path, None
+        return
+    timings = timings if timings is not None else StageTimings()
+    window = deque()
+    try:
+        for path in pdf_paths:
+            with timings.stage('parse'):
+                digest = pdf_digest(path)
+                cached = extraction_cache.has_document(digest)
+            if cached:
+                window.append((path, None))
+            else:
+                window.append((path, (digest, pdf_text.get_executor().submit(pdf_text.parse_pdf, path, digest))))
+            # Only the files in the window hold parse workers
+            while sum(1 for _, prefetched in window if prefetched is not None) >= pdf_text.PARSE_REQUEST_WORKERS:
+                yield window.popleft()
+        while window:
+            yield window.popleft()
+    finally:
+        for _, prefetched in window:
+            if prefetched is not None:
+                prefetched[1].cancel()
+
+def extract_text_from_pdf(pdf_path):
+    return "".join(page_text for _, _, page_text in iter_pdf_pages(pdf_path))
+
+def iter_pdfs_text(pdf_paths, timings=None, boilerplate_stats=None):
+    """Stream the text of several PDFs, separated the same way as process_pdfs.
+
+    Running headers, footers and page numbers are stripped per document.
+    """
+    for file_index, (path, prefetched) in enumerate(prefetch_pdfs(pdf_paths, timings)):
+        if file_index > 0:
+            yield "\n\n"
+        pages = iter_pdf_pages(path, timings, prefetched)
+        if boilerplate.BOILERPLATE:
+            pages = boilerplate.strip_pages(pages, boilerplate_stats)
+        for _, _, page_text in pages:
+            yield page_text
 
 def process_pdfs(pdf_paths):
-    combined_text = ""
-    for path in pdf_paths:
-        combined_text += extract_text_from_pdf(path) + "\n\n"
-    return combined_text.strip()
+    return "".join(iter_pdfs_text(pdf_paths)).strip()
 
 def chunk_text(text, chunk_size):
-    sentences = re.split(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\?)\s', text)
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for sentence in sentences:
-        sentence_length = len(sentence.split())
-        if current_length + sentence_length > chunk_size:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = []
-            current_length = 0
-        current_chunk.append(sentence)
-        current_length += sentence_length
-    
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
-    
-    return chunks
+    return [span.text for span in segmenter.chunk_spans(text, chunk_size)]
+
+def with_position(items):
+    """Yield (index, item, is_last) with one item of lookahead."""
+    iterator = iter(items)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    index = 0
+    for item in iterator:
+        yield index, previous, False
+        previous = item
+        index += 1
+    yield index, previous, True
 
 def clean_response(text):
     text = re.sub(r'<[^>]+>', '', text)
@@ -88,62 +264,93 @@ def clean_response(text):
     text = re.sub(r'[\`\*\_\[\]\(\)\#\+\-]', '', text)
     return text.strip()
 
-def generate_summary_iterative(text, content_style, duration, model):
-    chunk_size = 1000
-    chunks = chunk_text(text, chunk_size)
-    
-    duration_map = {
-        'small': (0.85, 1200),
-        'moderate': (0.78, 1500),
-        'lengthy': (0.70, 2000)
-    }
-    
-    style_instruction = {
-        'concise': "Focus on key findings with minimal elaboration, using clear direct language",
-        'elaborate': "Include detailed explanations with real-world examples and analogies",
-        'balanced': "Balance key points with contextual information, using both facts and narrative",
-        'formal': "Maintain academic tone with structured arguments and technical terminology",
-        'casual': "Use conversational language with personal anecdotes and rhetorical questions",
-        'professional': "Present well-researched insights with data references and expert quotes also use technical terms"
-    }
-    
-    temperature, max_tokens = duration_map.get(duration, (0.78, 1500))
-    
-    combined_summary = ""
-    title_added = False  # Track if title has been added
-    print(f"""
-    Content style: {content_style}
-    Duration: {duration}
-    Model: {model}
-          """)
-    for i, chunk in enumerate(chunks):
-        print(f"Processing chunk {i+1}/{len(chunks)}")
-        
-        # Structure instructions based on chunk position
-        structure_rules = []
-        if i == 0:
-            structure_rules = [
-                "BEGIN WITH: 'Title: \"[ENGAGING TITLE]\"' on first line",
-                "Follow with host introduction that sets context",
-                "Include brief overview of topics"
-            ]
-        elif i == len(chunks)-1:
-            structure_rules = [
-                "Conclude with key takeaways and final thoughts",
-                "End with memorable closing statement",
-                "Include call-to-action for listeners"
-            ]
-        else:
-            structure_rules = [
-                "Use natural transitions: 'Now, building on this...', 'Another crucial aspect...'",
-                "Maintain narrative flow from previous content",
-                "Include supporting examples or data points"
-            ]
+# Raw characters held back from the end of a stream, so patterns such as
+# "\\n" are never split between two cleaned pieces
+CLEAN_HOLDBACK = 64
+# Pieces end after a sentence, so a header such as "Segment 2:" starts the
+# next piece whole; only text this long with no sentence end is cut at a space
+CLEAN_MAX_SENTENCE = 1024
+SENTENCE_END = re.compile(r'''[.!?]["')]?\s''')
+
+def _safe_cut(buffer):
+    limit = len(buffer) - CLEAN_HOLDBACK
+    if limit <= 0:
+        return 0
+    cut = max((match.end() for match in SENTENCE_END.finditer(buffer, 0, limit)), default=0)
+    if not cut and limit > CLEAN_MAX_SENTENCE:
+        cut = max(buffer.rfind(' ', 0, limit), buffer.rfind('\n', 0, limit))
+    # Never cut inside a <tag>, [bracketed] or (parenthesised) span
+    for opening, closing in (('<', '>'), ('[', ']'), ('(', ')')):
+        start = buffer.rfind(opening, 0, cut)
+        if start != -1 and buffer.find(closing, start, cut) == -1:
+            cut = min(cut, start)
+    return max(cut, 0)
+
+def clean_stream(tokens, clean=clean_response):
+    """Apply clean_response to a token stream over a sliding window."""
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        cut = _safe_cut(buffer)
+        if cut:
+            cleaned = clean(buffer[:cut])
+            buffer = buffer[cut:]
+            if cleaned:
+                yield cleaned
+    cleaned = clean(buffer)
+    if cleaned:
+        yield cleaned
+
+CHUNK_SIZE = 1000
+# 'words' packs CHUNK_SIZE words per chunk; 'tokens' fills the model's context
+# window (LLM_CONTEXT_TOKENS) using the model's own tokenizer
+CHUNKER = os.getenv('CHUNKER', 'words')
+
+DURATION_MAP = {
+    'small': (0.85, 1200),
+    'moderate': (0.78, 1500),
+    'lengthy': (0.70, 2000)
+}
+
+STYLE_INSTRUCTION = {
+    'concise': "Focus on key findings with minimal elaboration, using clear direct language",
+    'elaborate': "Include detailed explanations with real-world examples and analogies",
+    'balanced': "Balance key points with contextual information, using both facts and narrative",
+    'formal': "Maintain academic tone with structured arguments and technical terminology",
+    'casual': "Use conversational language with personal anecdotes and rhetorical questions",
+    'professional': "Present well-researched insights with data references and expert quotes also use technical terms"
+}
+
+# Number of chunk prompts sent to Ollama at once; pair with OLLAMA_NUM_PARALLEL
+LLM_CONCURRENCY = max(1, int(os.getenv('LLM_CONCURRENCY', '1')))
 
-        prompt = f"""**Podcast Script Creation Guide**
+def build_chunk_prompt(chunk, index, is_last, content_style, duration):
+    # `chunk` may be a segmenter.Span; formatting it below is what slices the text
+    # Structure instructions based on chunk position
+    structure_rules = []
+    if index == 0:
+        structure_rules = [
+            "BEGIN WITH: 'Title: \"[ENGAGING TITLE]\"' on first line",
+            "Follow with host introduction that sets context",
+            "Include brief overview of topics"
+        ]
+    elif is_last:
+        structure_rules = [
+            "Conclude with key takeaways and final thoughts",
+            "End with memorable closing statement",
+            "Include call-to-action for listeners"
+        ]
+    else:
+        structure_rules = [
+            "Use natural transitions: 'Now, building on this...', 'Another crucial aspect...'",
+            "Maintain narrative flow from previous content",
+            "Include supporting examples or data points"
+        ]
+
+    return f"""**Podcast Script Creation Guide**
 Transform this research content into an engaging podcast script. Follow STRICTLY:
 
-1. CONTENT STYLE: {style_instruction[content_style]}
+1. CONTENT STYLE: {STYLE_INSTRUCTION[content_style]}
 2. TARGET DURATION: {duration.capitalize()} 
 3. CORE STRUCTURE:
    - {structure_rules[0]}
@@ -173,40 +380,120 @@ Transform this research content into an engaging podcast script. Follow STRICTLY
 
 **PODCAST SCRIPT:**"""
 
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                'model': model,
-                'prompt': prompt,
-                'stream': False,
-                'options': {
-                    'temperature': temperature,
-                    'max_tokens': max_tokens,
-                    'top_p': 0.88,
-                    'repeat_penalty': 1.25  # Increased to reduce repetition
-                }
-            }
-        )
-        
-        if response.status_code == 200:
-            cleaned = clean_response(response.json()['response'])
-            
-            # Post-processing rules
-            if i > 0:
-                # Remove any accidental titles in middle chunks
-                cleaned = re.sub(r'Title: ".+?"\n', '', cleaned)
-                # Remove section headers
-                cleaned = re.sub(r'\b(Segment|Part) \d+:', '', cleaned, flags=re.IGNORECASE)
-            
-            # Ensure only one title exists
-            if not title_added and re.search(r'Title: ".+?"', cleaned):
-                title_added = True
-            elif title_added:
-                cleaned = re.sub(r'Title: ".+?"\n', '', cleaned)
-
-            combined_summary += cleaned + " "
+def generation_options(duration):
+    temperature, max_tokens = DURATION_MAP.get(duration, (0.78, 1500))
+    options = {
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+        'top_p': 0.88,
+        'repeat_penalty': 1.25  # Increased to reduce repetition
+    }
+    if CHUNKER == 'tokens':
+        # Token-budgeted chunks assume the full context window is available
+        options['num_ctx'] = token_budget.LLM_CONTEXT_TOKENS
+    return options
+
+def prompt_overhead(count_tokens, content_style, duration):
+    """Tokens used by the prompt template itself, for the longest position."""
+    return max(count_tokens(build_chunk_prompt('', index, is_last, content_style, duration))
+               for index, is_last in ((0, False), (1, False), (1, True)))
+
+def iter_request_chunks(pieces, content_style, duration, model, timings=None):
+    """Chunk a text stream with the configured CHUNKER."""
+    if CHUNKER != 'tokens':
+        yield from segmenter.iter_chunks(pieces, CHUNK_SIZE, timings)
+        return
+    # Loaded lazily, here in the chunking stage, and cached per process
+    count_tokens = token_budget.get_token_counter(model)
+    max_tokens = DURATION_MAP.get(duration, (0.78, 1500))[1]
+    budget = token_budget.chunk_budget(prompt_overhead(count_tokens, content_style, duration), max_tokens)
+    yield from token_budget.iter_token_chunks(segmenter.iter_sentences(pieces, timings), budget, count_tokens)
+
+def postprocess_segment(cleaned, index):
+    # Post-processing rules
+    if index > 0:
+        # Remove any accidental titles in middle chunks
+        cleaned = re.sub(r'Title: ".+?"\n', '', cleaned)
+        # Remove section headers
+        cleaned = re.sub(r'\b(Segment|Part) \d+:', '', cleaned, flags=re.IGNORECASE)
+    return cleaned
+
+def llm_generate(prompt, options, model, use_cache=True, timings=None, label='chunk'):
+    """Raw LLM completion for a prompt, through the response cache; None on failure."""
+    timings = timings if timings is not None else StageTimings()
+    key = llm_cache.cache_key(f"{llm_backend.name}/{model}", prompt, options)
+    raw = llm_cache.get(key) if use_cache else None
+    if raw is None:
+        try:
+            start = time.perf_counter()
+            with timings.stage('llm'):
+                raw = llm_backend.generate(model, prompt, options)
+            timings.observe(metrics.LLM_REQUEST_SECONDS, time.perf_counter() - start)
+        except llm_backends.BackendError as e:
+            print(f"LLM error on {label}: {str(e)}")
+            return None
+        llm_cache.put(key, raw)
+    return raw
+
+def llm_generate_stream(prompt, options, model, clean, use_cache=True, label='chunk'):
+    """Like llm_generate, but yields cleaned text as the LLM produces it."""
+    key = llm_cache.cache_key(f"{llm_backend.name}/{model}", prompt, options)
+    cached = llm_cache.get(key) if use_cache else None
+    if cached is not None:
+        yield from clean_stream([cached], clean)
+        return
+
+    raw_parts = []
+
+    def tokens():
+        for token in llm_backend.generate_stream(model, prompt, options):
+            raw_parts.append(token)
+            yield token
+        # Only complete generations are cached
+        llm_cache.put(key, "".join(raw_parts))
+
+    try:
+        yield from clean_stream(tokens(), clean)
+    except llm_backends.BackendError as e:
+        print(f"LLM error on {label}: {str(e)}")
+
+def generate_chunk(chunk, index, is_last, content_style, duration, model, use_cache=True, timings=None):
+    """Generate and clean the script segment for one chunk, or None on failure."""
+    print(f"Processing chunk {index+1}")
+    timings = timings if timings is not None else StageTimings()
+    prompt = build_chunk_prompt(chunk, index, is_last, content_style, duration)
+    raw = llm_generate(prompt, generation_options(duration), model, use_cache, timings,
+                       label=f"chunk {index+1}")
+    if raw is None:
+        return None
+    with timings.stage('postprocess'):
+        return postprocess_segment(clean_response(raw), index)
+
+def generate_chunk_stream(chunk, index, is_last, content_style, duration, model, use_cache=True):
+    """Like generate_chunk, but yields cleaned text as the LLM produces it."""
+    print(f"Streaming chunk {index+1}")
+    prompt = build_chunk_prompt(chunk, index, is_last, content_style, duration)
+    clean = lambda text: postprocess_segment(clean_response(text), index).strip()
+    yield from llm_generate_stream(prompt, generation_options(duration), model, clean, use_cache,
+                                   label=f"chunk {index+1}")
+
+def finalize_summary(segments):
+    """Ordered post-pass: keep a single title and normalise spacing."""
+    summary_parts = []
+    title_added = False  # Track if title has been added
+    for cleaned in segments:
+        if cleaned is None:
+            continue
+        # Ensure only one title exists
+        if not title_added and re.search(r'Title: ".+?"', cleaned):
+            title_added = True
+        elif title_added:
+            cleaned = re.sub(r'Title: ".+?"\n', '', cleaned)
+
+        summary_parts.append(cleaned)
 
     # Final cleanup pipeline
+    combined_summary = " ".join(summary_parts)
     combined_summary = re.sub(r'\s+', ' ', combined_summary)
     combined_summary = re.sub(r'([,.!?:])(\w)', r'\1 \2', combined_summary)
     
@@ -219,15 +506,352 @@ Transform this research content into an engaging podcast script. Follow STRICTLY
     
     return combined_summary.strip()
 
+def select_request_chunks(chunks, duration, model, timings, report):
+    """Keep the most salient chunks that fit the duration's token budget.
+
+    The opening chunks pass straight through while they fit the leading
+    SELECTION_LEAD_SHARE of the budget, so the LLM starts on the first chunk
+    right away. Every later chunk is buffered, and once the text is fully
+    chunked they are ranked for the rest of the budget.
+    """
+    # The model's tokenizer is only loaded when chunks are budgeted in tokens
+    count_tokens = token_budget.approximate_count
+    if CHUNKER == 'tokens':
+        count_tokens = token_budget.get_token_counter(model)
+    budget = relevance.DURATION_TOKEN_BUDGET.get(duration, relevance.DURATION_TOKEN_BUDGET['moderate'])
+    lead = budget * relevance.SELECTION_LEAD_SHARE
+    texts = []
+    tokens = []
+    buffered = []
+    used = 0
+    for chunk in chunks:
+        text = str(chunk)
+        texts.append(text)
+        tokens.append(count_tokens(text))
+        if not buffered and (used + tokens[-1] <= lead or len(texts) == 1):
+            used += tokens[-1]
+            yield chunk
+        else:
+            buffered.append(chunk)
+    sent = len(texts) - len(buffered)
+    selected = list(range(sent))
+    if buffered:
+        with timings.stage('rank'):
+            selected, used = relevance.select(texts, budget, tokens, kept=sent)
+        print(f"Selected {len(selected)} of {len(texts)} chunks for a {duration} script")
+    report.update(chunks_total=len(texts), chunks_selected=len(selected), budget_tokens=budget,
+                  tokens_selected=used)
+    for index in selected[sent:]:
+        yield buffered[index - sent]
+
+def request_chunks(text, content_style, duration, model, timings, progress, select=False):
+    """Chunks of the full text or of a stream of text pieces.
+
+    Near-duplicate chunks are dropped and listed in progress['skipped_chunks'].
+    With `select`, only the most salient chunks that fit the duration's token
+    budget are kept, as reported in progress['selection'].
+    """
+    pieces = [text] if isinstance(text, str) else text
+    chunks = iter_request_chunks(pieces, content_style, duration, model, timings)
+    progress['skipped_chunks'] = []
+    if dedup.DEDUP:
+        chunks = dedup.iter_unique(chunks, progress['skipped_chunks'])
+    if select and relevance.CHUNK_SELECTION:
+        progress['selection'] = {}
+        chunks = select_request_chunks(chunks, duration, model, timings, progress['selection'])
+    if not isinstance(text, str):
+        # Chunk in the background so the next chunk is ready when the LLM is
+        chunks = pipeline.staged(chunks, pipeline.CHUNK_QUEUE_SIZE, name='chunk', timings=timings)
+    return chunks
+
+def map_chunks(chunks, work, progress, stage='generating', concurrency=None):
+    """Run work(chunk, index, is_last) for every chunk on `concurrency` threads
+    (LLM_CONCURRENCY by default).
+
+    Prompts only depend on their own chunk and position, so they can be
+    generated concurrently; results come back in chunk order.
+    """
+    def chunk_finished(_):
+        progress['chunks_done'] += 1
+
+    concurrency = concurrency or LLM_CONCURRENCY
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = deque()
+        for i, chunk, is_last in with_position(chunks):
+            progress['stage'] = stage
+            progress['chunks_total'] = i + 1
+            future = executor.submit(work, chunk, i, is_last)
+            future.add_done_callback(chunk_finished)
+            in_flight.append(future)
+            # Only keep a bounded window of requests in flight
+            while len(in_flight) > concurrency:
+                results.append(in_flight.popleft().result())
+        while in_flight:
+            results.append(in_flight.popleft().result())
+    return results
+
+def generate_summary_iterative(text, content_style, duration, model, progress=None, use_cache=True,
+                               timings=None):
+    timings = timings if timings is not None else StageTimings()
+    if progress is None:
+        progress = {}
+    progress.update(stage='extracting', chunks_done=0, chunks_total=0)
+    # One LLM call per chunk, so chunks are ranked to fit the duration
+    chunks = request_chunks(text, content_style, duration, model, timings, progress, select=True)
+
+    print(f"""
+    Content style: {content_style}
+    Duration: {duration}
+    Model: {model}
+          """)
+    segments = map_chunks(
+        chunks,
+        lambda chunk, i, is_last: generate_chunk(chunk, i, is_last, content_style, duration, model,
+                                                 use_cache, timings),
+        progress)
+
+    progress['stage'] = 'finalizing'
+    timings.observe(metrics.CHUNKS_PER_REQUEST, progress['chunks_total'])
+    timings.observe(metrics.DUPLICATE_CHUNKS_PER_REQUEST, len(progress['skipped_chunks']))
+    with timings.stage('postprocess'):
+        return finalize_summary(segments)
+
+# Map-reduce mode: short notes per chunk, merged MAP_REDUCE_FANIN at a time,
+# then a single script written from the merged notes. LLM calls on the
+# critical path grow with log(chunks), and the script length only depends on
+# the duration.
+SUMMARY_MODE = os.getenv('SUMMARY_MODE', 'iterative')
+MAP_REDUCE_FANIN = max(2, int(os.getenv('MAP_REDUCE_FANIN', '4')))
+NOTES_MAX_TOKENS = int(os.getenv('NOTES_MAX_TOKENS', '400'))
+NOTES_MAX_WORDS = int(os.getenv('NOTES_MAX_WORDS', '1500'))  # notes handed to the script prompt
+# Note and merge calls in flight at once. Separate from LLM_CONCURRENCY, whose
+# default of 1 would make the map phase N serial calls
+MAP_CONCURRENCY = max(1, int(os.getenv('MAP_CONCURRENCY', '4')))
+
+def notes_options():
+    options = {'temperature': 0.2, 'max_tokens': NOTES_MAX_TOKENS, 'top_p': 0.9}
+    if CHUNKER == 'tokens':
+        options['num_ctx'] = token_budget.LLM_CONTEXT_TOKENS
+    return options
+
+def build_notes_prompt(chunk):
+    return f"""**Research Notes**
+Extract the key points of this research excerpt as short factual notes, one per line.
+
+**RULES:**
+- KEEP findings, methods, numbers and named concepts
+- DROP references, headers, page numbers and boilerplate
+- AT MOST {NOTES_MAX_TOKENS * 3 // 4} words
+- ONLY THE NOTES SHOULD BE GENERATED
+
+**INPUT CONTENT:**
+{chunk}
+
+**NOTES:**"""
+
+def build_merge_prompt(notes):
+    sections = "\n\n".join(f"Section {i+1}:\n{section}" for i, section in enumerate(notes))
+    return f"""**Merge Research Notes**
+Combine these consecutive sections of notes into a single set of notes, keeping their order.
+
+**RULES:**
+- MERGE repeated points
+- KEEP the most important findings and every key number
+- AT MOST {NOTES_MAX_TOKENS * 3 // 4} words
+- ONLY THE NOTES SHOULD BE GENERATED
+
+{sections}
+
+**NOTES:**"""
+
+def build_script_prompt(notes, content_style, duration):
+    return f"""**Podcast Script Creation Guide**
+Write a complete podcast script from these research notes. Follow STRICTLY:
+
+1. CONTENT STYLE: {STYLE_INSTRUCTION[content_style]}
+2. TARGET DURATION: {duration.capitalize()}
+3. CORE STRUCTURE:
+   - BEGIN WITH: 'Title: "[ENGAGING TITLE]"' on first line
+   - Follow with host introduction that sets context and a brief overview of topics
+   - Walk through the key points in order with conversational transitions
+   - Conclude with key takeaways and a memorable closing statement
+
+**RULES:**
+- Single title line at beginning
+- NO MARKDOWN/HEADINGS in body text
+- BALANCE facts with engaging commentary
+- INCLUDE a few rhetorical questions
+- CITE surprising statistics where available
+- ADD relatable analogies for complex concepts
+- NO EMOJIS or SPECIAL CHARACTERS
+- ALSO ONLY THE PODCAST SCRIPT SHOULD BE GENERATED, NO NEED TO ASK FOR SUGGESTIONS AT THE END OF THE SCRIPT
+
+**TONE:**
+- Friendly yet authoritative
+- Enthusiastic but professional
+- Accessible to non-experts
+- Vary sentence structure and length
+
+**NOTES:**
+{notes}
+
+**PODCAST SCRIPT:**"""
+
+def generate_notes(chunk, index, model, use_cache=True, timings=None):
+    raw = llm_generate(build_notes_prompt(chunk), notes_options(), model, use_cache, timings,
+                       label=f"notes {index+1}")
+    return raw.strip() if raw is not None else None
+
+def merge_notes(group, model, use_cache=True, timings=None):
+    if len(group) == 1:
+        return group[0]
+    raw = llm_generate(build_merge_prompt(group), notes_options(), model, use_cache, timings,
+                       label='merge')
+    # Keep the unmerged notes rather than losing a section
+    return raw.strip() if raw is not None else "\n".join(group)
+
+def map_reduce_notes(text, content_style, duration, model, progress=None, use_cache=True, timings=None):
+    """Notes for the whole text: one per chunk in parallel, merged level by level."""
+    timings = timings if timings is not None else StageTimings()
+    if progress is None:
+        progress = {}
+    progress.update(stage='extracting', chunks_done=0, chunks_total=0)
+    chunks = request_chunks(text, content_style, duration, model, timings, progress)
+
+    notes = map_chunks(chunks, lambda chunk, i, is_last: generate_notes(chunk, i, model, use_cache, timings),
+                       progress, stage='mapping', concurrency=MAP_CONCURRENCY)
+    timings.observe(metrics.CHUNKS_PER_REQUEST, progress['chunks_total'])
+    timings.observe(metrics.DUPLICATE_CHUNKS_PER_REQUEST, len(progress['skipped_chunks']))
+    notes = [section for section in notes if section]
+
+    progress['stage'] = 'reducing'
+    with ThreadPoolExecutor(max_workers=MAP_CONCURRENCY) as executor:
+        while len(notes) > 1 and sum(len(section.split()) for section in notes) > NOTES_MAX_WORDS:
+            groups = [notes[i:i + MAP_REDUCE_FANIN] for i in range(0, len(notes), MAP_REDUCE_FANIN)]
+            notes = list(executor.map(lambda group: merge_notes(group, model, use_cache, timings), groups))
+    return "\n\n".join(notes)
+
+def generate_summary_mapreduce(text, content_style, duration, model, progress=None, use_cache=True,
+                               timings=None):
+    timings = timings if timings is not None else StageTimings()
+    if progress is None:
+        progress = {}
+    notes = map_reduce_notes(text, content_style, duration, model, progress, use_cache, timings)
+
+    progress['stage'] = 'finalizing'
+    raw = llm_generate(build_script_prompt(notes, content_style, duration), generation_options(duration),
+                       model, use_cache, timings, label='script')
+    with timings.stage('postprocess'):
+        return finalize_summary([clean_response(raw) if raw is not None else None])
+
+SUMMARIZERS = {
+    'iterative': generate_summary_iterative,
+    'mapreduce': generate_summary_mapreduce
+}
+
+def save_uploads(files):
+    """Claim the spooled PDFs of this request; they were written while parsing the body."""
+    saved_paths = []
+    try:
+        for file in files:
+            if file and isinstance(file.stream, uploads.Spool):
+                saved_paths.append(file.stream.finish())
+    except Exception:
+        # Files claimed before the failing one are no longer discarded on teardown
+        remove_uploads(saved_paths)
+        raise
+    return saved_paths
+
+def remove_uploads(saved_paths):
+    for path in saved_paths:
+        uploads.remove(path)
+
+# Models offered by the frontend; any other model is labelled 'other', so
+# clients cannot create unbounded metric series
+METRIC_MODELS = frozenset(
+    os.getenv('METRIC_MODELS', '').split(',') if os.getenv('METRIC_MODELS') else [
+        DEFAULT_MODEL, 'llama3.1:latest', 'llama3:latest', 'mixtral:latest', 'phi:latest', 'llava:7b',
+        'phi3:latest', 'deepseek-r1:7b', 'deepseek-r1:1.5b'
+    ])
+
+def metric_labels(content_style, duration, model):
+    """Label values for a request's metrics, limited to known values."""
+    return {
+        'model': model if model in METRIC_MODELS else 'other',
+        'style': content_style if content_style in STYLE_INSTRUCTION else 'other',
+        'duration': duration if duration in DURATION_MAP else 'other'
+    }
+
+def observe_boilerplate(boilerplate_stats, timings):
+    report = boilerplate.report(boilerplate_stats)
+    timings.observe(metrics.BOILERPLATE_PERCENT_REMOVED, report['percent_removed'])
+    return report
+
+def store_result(summary, content_style, duration, saved_paths):
+    # Create result entry
+    result_id = str(uuid.uuid4())
+    results_storage[result_id] = {
+        'summary': summary,
+        'content_style': content_style,
+        'duration': duration,
+        'processed_files': [os.path.basename(p) for p in saved_paths]
+    }
+    return result_id
+
+def run_generation(saved_paths, content_style, duration, model, progress=None, use_cache=True,
+                   mode='iterative'):
+    """Run the full pipeline on saved PDFs and store the result.
+
+    Always removes the uploaded files, including on failure.
+    """
+    timings = StageTimings(metric_labels(content_style, duration, model))
+    progress = progress if progress is not None else {}
+    boilerplate_stats = {}
+    try:
+        # Extraction runs ahead of chunking and the LLM, bounded by the queue size
+        pages = pipeline.staged(iter_pdfs_text(saved_paths, timings, boilerplate_stats),
+                                pipeline.PAGE_QUEUE_SIZE, name='extract', timings=timings)
+        summary = SUMMARIZERS[mode](pages, content_style, duration, model, progress, use_cache, timings)
+        
+        result_id = store_result(summary, content_style, duration, saved_paths)
+    finally:
+        remove_uploads(saved_paths)
+    timings.publish()
+    print(f"Result ID: {result_id}")
+    print(f"Summary: {summary}")
+    print(f"Content style: {content_style}")
+    print(f"Duration: {duration}")
+    return {
+        'result_id': result_id,
+        'summary': summary,
+        'content_style': content_style,
+        'duration': duration,
+        'mode': mode,
+        'skipped_chunks': progress.get('skipped_chunks', []),
+        'selection': progress.get('selection'),
+        'boilerplate': observe_boilerplate(boilerplate_stats, timings),
+        'timings': timings.as_dict()
+    }
+
+def read_generation_form():
+    content_style = request.form.get('contentStyle', 'concise')
+    model = request.form.get('model', DEFAULT_MODEL)
+    duration = request.form.get('duration', 'moderate')
+    # freshSampling=true skips the LLM response cache for this request
+    use_cache = request.form.get('freshSampling', 'false').lower() != 'true'
+    mode = request.form.get('mode', SUMMARY_MODE)
+    if mode not in SUMMARIZERS:
+        mode = SUMMARY_MODE
+    return content_style, duration, model, use_cache, mode
+
 @app.route('/generate', methods=['POST'])
 def process_uploaded_pdfs():
     if 'pdfs' not in request.files:
         return jsonify({'error': 'No files uploaded'}), 400
     
     files = request.files.getlist('pdfs')
-    content_style = request.form.get('contentStyle', 'concise')
-    model = request.form.get('model', 'mistral:7b-instruct')
-    duration = request.form.get('duration', 'moderate')
+    content_style, duration, model, use_cache, mode = read_generation_form()
     print(f"Content style: {content_style}, Duration: {duration}")
     # Check if files are uploaded
     print(files)
@@ -235,59 +859,250 @@ def process_uploaded_pdfs():
     if not files or len(files) == 0:
         return jsonify({'error': 'No files selected'}), 400
     
-    saved_paths = []
+    saved_paths = save_uploads(files)
+    if not saved_paths:
+        return jsonify({'error': 'No valid PDF files uploaded'}), 400
+
     try:
-        # Save uploaded files
-        for file in files:
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(save_path)
-                saved_paths.append(save_path)
-        
-        if not saved_paths:
-            return jsonify({'error': 'No valid PDF files uploaded'}), 400
-        
-        # Process PDFs
-        combined_text = process_pdfs(saved_paths)
-        summary = generate_summary_iterative(combined_text, content_style, duration, model)
-        
-        # Create result entry
-        result_id = str(uuid.uuid4())
-        results_storage[result_id] = {
-            'summary': summary,
-            'content_style': content_style,
-            'duration': duration,
-            'processed_files': [os.path.basename(p) for p in saved_paths]
-        }
-        
-        # Cleanup uploaded files
-        for path in saved_paths:
-            if os.path.exists(path):
-                os.remove(path)
-        print(f"Result ID: {result_id}")
-        print(f"Summary: {summary}")
-        print(f"Content style: {content_style}")
-        print(f"Duration: {duration}")
-        return jsonify({
-            'result_id': result_id,
-            'summary': summary,
-            'content_style': content_style,
-            'duration': duration
-        })
+        return jsonify(run_generation(saved_paths, content_style, duration, model, use_cache=use_cache,
+                                       mode=mode))
     
     except Exception as e:
         # Cleanup files on error
-        for path in saved_paths:
-            if os.path.exists(path):
-                os.remove(path)
+        remove_uploads(saved_paths)
         return jsonify({'error': str(e)}), 500
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/generate/stream', methods=['POST'])
+def stream_uploaded_pdfs():
+    """Server-Sent Events version of /generate.
+
+    Emits `token` events with cleaned script text as it is generated, then a
+    `done` event carrying the finalized summary and its result_id.
+    """
+    if 'pdfs' not in request.files:
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    files = request.files.getlist('pdfs')
+    content_style, duration, model, use_cache, mode = read_generation_form()
+    saved_paths = save_uploads(files)
+    if not saved_paths:
+        return jsonify({'error': 'No valid PDF files uploaded'}), 400
+
+    def events():
+        segments = []
+        progress = {}
+        boilerplate_stats = {}
+        timings = StageTimings(metric_labels(content_style, duration, model))
+        try:
+            pages = pipeline.staged(iter_pdfs_text(saved_paths, timings, boilerplate_stats),
+                                    pipeline.PAGE_QUEUE_SIZE,
+                                    name='extract', timings=timings)
+            if mode == 'mapreduce':
+                # Notes are reduced up front; only the final script is streamed
+                notes = map_reduce_notes(pages, content_style, duration, model, progress, use_cache, timings)
+                prompt = build_script_prompt(notes, content_style, duration)
+                scripts = [(0, llm_generate_stream(prompt, generation_options(duration), model,
+                                                   lambda text: clean_response(text).strip(), use_cache,
+                                                   label='script'))]
+            else:
+                chunks = request_chunks(pages, content_style, duration, model, timings, progress, select=True)
+                scripts = ((i, generate_chunk_stream(chunk, i, is_last, content_style, duration, model, use_cache))
+                           for i, chunk, is_last in with_position(chunks))
+            # Chunks are streamed one after another so text arrives in script order
+            for i, script in scripts:
+                parts = []
+                for piece in script:
+                    parts.append(piece)
+                    yield sse_event('token', {'chunk': i, 'text': piece + " "})
+                # Once more on the whole segment, in case a header was cut at a space
+                segments.append(postprocess_segment(" ".join(parts), i))
+
+            if mode == 'iterative':
+                timings.observe(metrics.CHUNKS_PER_REQUEST, len(segments))
+                timings.observe(metrics.DUPLICATE_CHUNKS_PER_REQUEST, len(progress['skipped_chunks']))
+            summary = finalize_summary(segments)
+            result_id = store_result(summary, content_style, duration, saved_paths)
+            timings.publish()
+            yield sse_event('done', {
+                'result_id': result_id,
+                'summary': summary,
+                'content_style': content_style,
+                'duration': duration,
+                'skipped_chunks': progress.get('skipped_chunks', []),
+                'selection': progress.get('selection'),
+                'boilerplate': observe_boilerplate(boilerplate_stats, timings)
+            })
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+        finally:
+            remove_uploads(saved_paths)
+
+    return Response(stream_with_context(events()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Background jobs: POST /jobs returns immediately, GET /jobs/<id> polls
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_QUEUE_LIMIT = int(os.getenv('JOB_QUEUE_LIMIT', '20'))
+JOB_TTL = int(os.getenv('JOB_TTL', '3600'))  # seconds a finished job stays visible
+JOB_PUBLISH_SECONDS = float(os.getenv('JOB_PUBLISH_SECONDS', '1'))
+
+# Jobs run by this worker, whose dicts double as pipeline progress; snapshots
+# go to job_store so GET /jobs/<id> works on any worker. JOB_QUEUE_LIMIT
+# applies per worker, like its job_executor.
+jobs = {}
+jobs_lock = threading.Lock()
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+job_store = result_store.create_job_store(JOB_TTL)
+
+def save_job(job):
+    try:
+        job_store[job['job_id']] = dict(job)
+    except (RuntimeError, sqlite3.Error) as e:
+        # Progress changed mid-copy or the store is busy; the next save catches up
+        print(f"Saving job {job['job_id']} failed: {str(e)}")
+
+def prune_jobs():
+    now = time.time()
+    with jobs_lock:
+        expired = [job_id for job_id, job in jobs.items()
+                   if job['finished_at'] and now - job['finished_at'] > JOB_TTL]
+        for job_id in expired:
+            del jobs[job_id]
+
+def run_job(job_id, saved_paths, content_style, duration, model, use_cache, mode):
+    job = jobs[job_id]
+    job['state'] = 'running'
+    metrics.QUEUE_WAIT_SECONDS.observe(time.time() - job['created_at'], queue='jobs',
+                                       **metric_labels(content_style, duration, model))
+    finished = threading.Event()
+
+    def publish_progress():
+        while not finished.wait(JOB_PUBLISH_SECONDS):
+            save_job(job)
+
+    threading.Thread(target=publish_progress, name=f"job-progress-{job_id[:8]}", daemon=True).start()
+    try:
+        result = run_generation(saved_paths, content_style, duration, model, job, use_cache, mode)
+        job.update(state='done', stage='done', result_id=result['result_id'], result=result)
+    except Exception as e:
+        print(f"Job {job_id} failed: {str(e)}")
+        job.update(state='failed', error=str(e))
+    job['finished_at'] = time.time()
+    finished.set()
+    save_job(job)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    if 'pdfs' not in request.files:
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    prune_jobs()
+    with jobs_lock:
+        active = sum(1 for job in jobs.values() if job['state'] in ('queued', 'running'))
+    if active >= JOB_QUEUE_LIMIT:
+        return jsonify({'error': 'Too many jobs in progress, try again later'}), 503
+
+    files = request.files.getlist('pdfs')
+    content_style, duration, model, use_cache, mode = read_generation_form()
+    saved_paths = save_uploads(files)
+    if not saved_paths:
+        return jsonify({'error': 'No valid PDF files uploaded'}), 400
+
+    job_id = str(uuid.uuid4())
+    with jobs_lock:
+        jobs[job_id] = {
+            'job_id': job_id,
+            'state': 'queued',
+            'stage': 'queued',
+            'chunks_done': 0,
+            'chunks_total': 0,
+            'content_style': content_style,
+            'duration': duration,
+            'model': model,
+            'mode': mode,
+            'result_id': None,
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None
+        }
+        save_job(jobs[job_id])
+    job_executor.submit(run_job, job_id, saved_paths, content_style, duration, model, use_cache, mode)
+    return jsonify({'job_id': job_id, 'state': 'queued'}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # Live progress if this worker runs the job, else the last saved snapshot
+    job = jobs.get(job_id)
+    if job is None:
+        job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(dict(job))
+
 @app.route('/get_summary/<result_id>', methods=['GET'])
 def get_summary(result_id):
-    if result_id in results_storage:
-        return jsonify(results_storage[result_id])
+    result = results_storage.get(result_id)
+    if result is not None:
+        return jsonify(result)
     return jsonify({'error': 'Result not found'}), 404
 
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'extraction': extraction_cache.stats(),
+        'llm': llm_cache.stats(),
+        'llm_client': llm_client.stats(),
+        'uploads': uploads.stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    extra = []
+    extra += metrics.render_counters('voicecraft_extraction_cache', 'Extraction cache counters.',
+                                     extraction_cache.stats(), 'gauge')
+    extra += metrics.render_counters('voicecraft_llm_cache', 'LLM response cache counters.',
+                                     llm_cache.stats(), 'gauge')
+    extra += metrics.render_counters('voicecraft_llm_client', 'LLM HTTP client counters.',
+                                     llm_client.stats(), 'gauge')
+    extra += metrics.render_counters('voicecraft_ocr', 'Tiered OCR page counters.',
+                                     ocr.stats(), 'gauge')
+    extra += metrics.render_counters('voicecraft_uploads', 'Upload area counters.',
+                                     uploads.stats(), 'gauge')
+    return Response(metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+# The OCR stack and the tokenizer load in the background, so the server
+# accepts connections right away; /ready reports when they are in memory
+WARMUP = os.getenv('WARMUP', '1') != '0'
+warmup_state = {'ready': False, 'started_at': None, 'finished_at': None, 'errors': {}}
+
+def warm_up():
+    warmup_state['started_at'] = time.time()
+    steps = [('ocr', ocr.warm_up)]
+    if CHUNKER == 'tokens':
+        steps.append(('tokenizer', lambda: token_budget.get_token_counter(DEFAULT_MODEL)))
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            # Still ready: text-only PDFs never need the OCR stack
+            warmup_state['errors'][name] = str(e)
+            print(f"Warm-up of {name} failed: {str(e)}")
+    warmup_state['finished_at'] = time.time()
+    warmup_state['ready'] = True
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    return jsonify(warmup_state), 200 if warmup_state['ready'] else 503
+
+if WARMUP and not IN_POOL_WORKER:
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+else:
+    warmup_state['ready'] = True
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8000, debug=True)
\ No newline at end of file
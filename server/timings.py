@@ -0,0 +1,52 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+
+class StageTimings:
+    """Seconds spent per pipeline stage for one request.
+
+    Stages overlap when pipelined, and concurrent LLM calls add up, so these
+    are busy times per stage rather than slices of the wall clock.
+    """
+
+    def __init__(self, labels=None):
+        # model/style/duration labels; without them nothing is exported
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._seconds = {}
+        self._counts = {}
+        self._start = time.perf_counter()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._seconds[stage] = self._seconds.get(stage, 0.0) + seconds
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def observe(self, histogram, value, **extra_labels):
+        if self.labels is not None:
+            histogram.observe(value, **self.labels, **extra_labels)
+
+    def publish(self):
+        """Export the per-stage totals of a finished request."""
+        with self._lock:
+            totals = dict(self._seconds)
+        for stage, seconds in totals.items():
+            self.observe(metrics.STAGE_SECONDS, seconds, stage=stage)
+
+    def as_dict(self):
+        with self._lock:
+            result = {stage: round(seconds, 4) for stage, seconds in self._seconds.items()}
+            result['counts'] = dict(self._counts)
+        result['total'] = round(time.perf_counter() - self._start, 4)
+        return result
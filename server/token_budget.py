@@ -0,0 +1,102 @@
+import os
+import threading
+
+# Ollama model family -> HuggingFace tokenizer with the same vocabulary
+TOKENIZER_MODELS = {
+    'mistral': 'mistralai/Mistral-7B-Instruct-v0.2',
+    'llama3': 'meta-llama/Meta-Llama-3-8B',
+    'llama2': 'meta-llama/Llama-2-7b-hf',
+    'gemma': 'google/gemma-7b',
+    'qwen2': 'Qwen/Qwen2-7B-Instruct',
+    'phi3': 'microsoft/Phi-3-mini-4k-instruct'
+}
+
+TOKENIZER_NAME = os.getenv('TOKENIZER_NAME', '')  # overrides the lookup above
+LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', '8192'))
+TOKEN_SAFETY_MARGIN = int(os.getenv('TOKEN_SAFETY_MARGIN', '64'))
+
+_tokenizers = {}
+_lock = threading.Lock()
+
+
+def tokenizer_name(model):
+    if TOKENIZER_NAME:
+        return TOKENIZER_NAME
+    family = model.split(':', 1)[0].split('/')[-1].lower()
+    for prefix, name in TOKENIZER_MODELS.items():
+        if family.startswith(prefix):
+            return name
+    return None
+
+
+def approximate_count(text):
+    # ~4 characters per token for English subword vocabularies
+    return max(1, len(text) // 4) if text else 0
+
+
+def get_token_counter(model):
+    """Return a count_tokens(text) function for the model.
+
+    The tokenizer is loaded on first use and then shared by every request in
+    the process. Without transformers, or when the tokenizer cannot be
+    downloaded, a character-based estimate is used instead.
+    """
+    name = tokenizer_name(model)
+    with _lock:
+        if name in _tokenizers:
+            return _tokenizers[name]
+        counter = approximate_count
+        if name:
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(name, token=os.getenv('HF_KEY') or None)
+                counter = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+                print(f"Loaded tokenizer {name} for {model}")
+            except Exception as e:
+                print(f"Tokenizer {name} unavailable, estimating tokens: {str(e)}")
+        _tokenizers[name] = counter
+        return counter
+
+
+def chunk_budget(prompt_overhead, max_output_tokens):
+    """Tokens left for chunk text once the template and the reply are reserved."""
+    return max(256, LLM_CONTEXT_TOKENS - prompt_overhead - max_output_tokens - TOKEN_SAFETY_MARGIN)
+
+
+def _split_oversized(sentence, budget, count_tokens):
+    words = sentence.split()
+    current = []
+    current_tokens = 0
+    for word in words:
+        word_tokens = count_tokens(' ' + word)
+        if current and current_tokens + word_tokens > budget:
+            yield ' '.join(current), current_tokens
+            current = []
+            current_tokens = 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        yield ' '.join(current), current_tokens
+
+
+def iter_token_chunks(sentences, budget, count_tokens):
+    """Pack sentences into chunks of at most `budget` tokens.
+
+    Each sentence is encoded once, on its own, as it streams in.
+    """
+    current_chunk = []
+    current_tokens = 0
+    for sentence in sentences:
+        sentence_tokens = count_tokens(sentence) + 1  # joining space
+        parts = [(sentence, sentence_tokens)]
+        if sentence_tokens > budget:
+            parts = list(_split_oversized(sentence, budget, count_tokens))
+        for part, part_tokens in parts:
+            if current_chunk and current_tokens + part_tokens > budget:
+                yield ' '.join(current_chunk)
+                current_chunk = []
+                current_tokens = 0
+            current_chunk.append(part)
+            current_tokens += part_tokens
+    if current_chunk:
+        yield ' '.join(current_chunk)
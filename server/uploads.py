@@ -0,0 +1,214 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from werkzeug.exceptions import BadRequest, ServiceUnavailable
+
+# Fixed across restarts, so files left behind by a crashed worker are swept
+UPLOAD_DIR = os.getenv('UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'voicecraft-uploads'))
+UPLOAD_QUOTA_BYTES = int(os.getenv('UPLOAD_QUOTA_MB', '1024')) * 1024 * 1024
+UPLOAD_SWEEP_INTERVAL = int(os.getenv('UPLOAD_SWEEP_INTERVAL', '60'))  # seconds
+# Uploads not touched for this long belong to no live request in any process
+UPLOAD_STALE_SECONDS = int(os.getenv('UPLOAD_STALE_SECONDS', '600'))
+
+PDF_MAGIC = b'%PDF'
+
+_lock = threading.Lock()
+_active = {}  # spool directory -> Spool, for uploads still in use in this process
+_digests = {}  # path -> SHA-256 of uploads still in use
+_usage = None  # bytes in UPLOAD_DIR, recomputed by each sweep
+_stats = {'spooled': 0, 'rejected': 0, 'refused': 0, 'swept': 0}
+_sweeper = None
+
+
+class InvalidUpload(BadRequest):
+    """A file named .pdf that does not start with a PDF header."""
+
+
+class UploadQuotaExceeded(ServiceUnavailable):
+    """The upload area is full; the client may retry once it is swept."""
+
+
+def _count(key, amount=1):
+    with _lock:
+        _stats[key] += amount
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _reserve(size):
+    """Account for `size` more bytes, or refuse if the quota would be exceeded."""
+    global _usage
+    with _lock:
+        if _usage is None:
+            _usage = _dir_size(UPLOAD_DIR)
+        if _usage + size > UPLOAD_QUOTA_BYTES:
+            _stats['refused'] += 1
+            raise UploadQuotaExceeded('Upload storage is full, try again later')
+        _usage += size
+
+
+def _release(size):
+    global _usage
+    with _lock:
+        if _usage is not None:
+            _usage = max(0, _usage - size)
+
+
+class Spool:
+    """Writable file that stores one upload under a unique directory.
+
+    Werkzeug writes the multipart body into it as it is read, so the PDF
+    header is checked on the first bytes and the SHA-256 is computed on the
+    way through. Raising from write() aborts parsing of the rest of the body.
+    """
+
+    def __init__(self, filename):
+        self.directory = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+        os.makedirs(self.directory)
+        # The original name is kept so results still list it
+        self.path = os.path.join(self.directory, filename)
+        self.filename = filename
+        self.size = 0
+        self.claimed = False
+        self._sha = hashlib.sha256()
+        self._head = b''
+        self._file = open(self.path, 'w+b')
+        with _lock:
+            _active[self.directory] = self
+            _stats['spooled'] += 1
+
+    def write(self, data):
+        if len(self._head) < len(PDF_MAGIC):
+            self._head += data[:len(PDF_MAGIC) - len(self._head)]
+            if not PDF_MAGIC.startswith(self._head):
+                self._reject()
+        _reserve(len(data))
+        self.size += len(data)
+        self._sha.update(data)
+        return self._file.write(data)
+
+    def _reject(self):
+        _count('rejected')
+        self.discard()
+        raise InvalidUpload(f"{self.filename} is not a PDF file")
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def close(self):
+        self._file.close()
+
+    def finish(self):
+        """Close the spool file and return its path; the upload stays in use."""
+        if self._head != PDF_MAGIC:
+            self._reject()
+        self._file.close()
+        self.claimed = True
+        with _lock:
+            _digests[self.path] = self._sha.hexdigest()
+        return self.path
+
+    def discard(self):
+        self._file.close()
+        remove(self.path)
+
+
+def digest(path):
+    """SHA-256 computed while the upload was spooled, or None if unknown."""
+    with _lock:
+        return _digests.get(path)
+
+
+def remove(path):
+    directory = os.path.dirname(path)
+    with _lock:
+        spool = _active.pop(directory, None)
+        _digests.pop(path, None)
+    shutil.rmtree(directory, ignore_errors=True)
+    if spool is not None:
+        _release(spool.size)
+
+
+def sweep():
+    """Delete stale upload directories and recompute the disk usage.
+
+    Directories of uploads still in use here are touched first, so sweepers
+    in other processes sharing UPLOAD_DIR see them as live.
+    """
+    global _usage
+    now = time.time()
+    with _lock:
+        live = set(_active)
+    for directory in live:
+        try:
+            os.utime(directory, None)
+        except OSError:
+            pass
+    try:
+        names = os.listdir(UPLOAD_DIR)
+    except OSError:
+        return
+    swept = 0
+    for name in names:
+        directory = os.path.join(UPLOAD_DIR, name)
+        if directory in live:
+            continue
+        try:
+            stale = now - os.path.getmtime(directory) > UPLOAD_STALE_SECONDS
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(directory, ignore_errors=True)
+            swept += 1
+    usage = _dir_size(UPLOAD_DIR)
+    with _lock:
+        _usage = usage
+        _stats['swept'] += swept
+
+
+def _sweep_forever():
+    while True:
+        try:
+            sweep()
+        except Exception as e:
+            print(f"Upload sweep failed: {str(e)}")
+        time.sleep(UPLOAD_SWEEP_INTERVAL)
+
+
+def start_sweeper():
+    global _sweeper
+    with _lock:
+        if _sweeper is not None:
+            return
+        _sweeper = threading.Thread(target=_sweep_forever, name='upload-sweeper', daemon=True)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    _sweeper.start()
+
+
+def stats():
+    with _lock:
+        result = dict(_stats)
+        result['bytes'] = _usage or 0
+        result['active'] = len(_active)
+    result['quota_bytes'] = UPLOAD_QUOTA_BYTES
+    return result